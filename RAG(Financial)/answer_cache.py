@@ -0,0 +1,116 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+from datetime import datetime, timezone
+import numpy as np
+from metadata_index import parse_query_filters
+
+# Time windows are parsed against a fixed clock, so "last 24h" asked today and tomorrow
+# (or "last 1d") give the same signature
+_FILTERS_CLOCK = datetime(2000, 1, 1, tzinfo=timezone.utc)
+
+def filters_signature(query):
+    # Pairs, document type and time window the query asks about, as a comparable string
+    return json.dumps(parse_query_filters(query, now=_FILTERS_CLOCK), sort_keys=True)
+
+class AnswerCache:
+    # Answers persisted in SQLite and keyed by (index version, normalized query). On an
+    # exact miss, an answer to a near-duplicate query is reused when the cosine similarity
+    # of the query embeddings reaches similarity_threshold and both queries name the same
+    # pairs, document type and time window. Entries expire after
+    # ttl_seconds and the least recently used ones are evicted beyond max_entries.
+    def __init__(self, file_path, version='', ttl_seconds=7 * 24 * 3600, max_entries=1000,
+                 similarity_threshold=0.95):
+        os.makedirs(os.path.dirname(file_path) or '.', exist_ok=True)
+        self.conn = sqlite3.connect(file_path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS answers ("
+            "key TEXT PRIMARY KEY, version TEXT, query TEXT, embedding BLOB, "
+            "answer TEXT, created REAL, accessed REAL, filters TEXT)"
+        )
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(answers)")]
+        if 'filters' not in columns:
+            # Caches written before filters were recorded only serve exact repeats
+            self.conn.execute("ALTER TABLE answers ADD COLUMN filters TEXT")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS answers_version ON answers (version)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS answers_accessed ON answers (accessed)")
+        self.conn.commit()
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.similarity_threshold = similarity_threshold
+        self.version = None
+        self.set_version(version)
+
+    def set_version(self, version):
+        # Answers computed against another index version can never be served again
+        version = str(version)
+        if version == self.version:
+            return
+        self.version = version
+        self.conn.execute("DELETE FROM answers WHERE version != ?", (version,))
+        self.conn.commit()
+        self._load_embeddings()
+
+    def _load_embeddings(self):
+        rows = self.conn.execute(
+            "SELECT key, embedding, filters FROM answers WHERE version = ? AND embedding IS NOT NULL", (self.version,)
+        ).fetchall()
+        self.keys = [key for key, _, _ in rows]
+        self.filters = np.array([filters or '' for _, _, filters in rows], dtype=object)
+        self.embeddings = [np.frombuffer(embedding, dtype='float32') for _, embedding, _ in rows]
+        self.matrix = np.vstack(self.embeddings) if self.embeddings else None
+
+    def _key(self, query):
+        normalized = ' '.join(query.lower().split())
+        return hashlib.sha256(f"{self.version}\0{normalized}".encode('utf-8')).hexdigest()
+
+    def _fetch(self, key):
+        row = self.conn.execute("SELECT answer, created FROM answers WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        answer, created = row
+        if time.time() - created > self.ttl_seconds:
+            return None
+        self.conn.execute("UPDATE answers SET accessed = ? WHERE key = ?", (time.time(), key))
+        self.conn.commit()
+        return answer
+
+    def get(self, query, embedding=None):
+        answer = self._fetch(self._key(query))
+        if answer is not None or embedding is None or self.matrix is None:
+            return answer
+
+        # Embeddings are L2-normalized, so the dot product is the cosine similarity. A near
+        # duplicate about another pair or time window is a different question.
+        similarities = self.matrix @ np.asarray(embedding, dtype='float32').reshape(-1)
+        similarities[self.filters != filters_signature(query)] = -np.inf
+        best = int(np.argmax(similarities))
+        if similarities[best] >= self.similarity_threshold:
+            return self._fetch(self.keys[best])
+        return None
+
+    def put(self, query, embedding, answer):
+        key = self._key(query)
+        now = time.time()
+        blob = None if embedding is None else np.asarray(embedding, dtype='float32').reshape(-1).tobytes()
+        self.conn.execute(
+            "INSERT OR REPLACE INTO answers (key, version, query, embedding, answer, created, accessed, filters) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (key, self.version, query, blob, answer, now, now, filters_signature(query))
+        )
+        self._evict(now)
+        self.conn.commit()
+        self._load_embeddings()
+
+    def _evict(self, now):
+        self.conn.execute("DELETE FROM answers WHERE created < ?", (now - self.ttl_seconds,))
+        self.conn.execute(
+            "DELETE FROM answers WHERE key IN ("
+            "SELECT key FROM answers ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,239 @@
+import os
+import sys
+import time
+import subprocess
+import numpy as np
+import faiss
+import index_factory
+import data_loader
+from knowledge_graph import KnowledgeGraphBuilder
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = 'data'
+EMBEDDINGS_PATH = os.path.join(DATA_DIR, 'indexes', 'embeddings.pkl')
+
+def _load_corpus(data_dir):
+    documents = []
+    for root, _, files in os.walk(data_dir):
+        if any(excluded in root.replace('\\', '/') for excluded in ('/indexes', '/graph_visualization_files')):
+            continue
+        for file in sorted(files):
+            if file.endswith(('.txt', '.pdf', '.json', '.xlsx', '.xls')):
+                content = data_loader._read_any_file(os.path.join(root, file))
+                if content:
+                    documents.append(content)
+    return documents
+
+def _insert_with_scans(extracted):
+    # The list-scanning deduplication build_knowledge_graph used before the hashed indexes
+    nodes, relationships = [], []
+    for entities, relations in extracted:
+        for entity, label in entities:
+            if not any(e['name'] == entity and e['label'] == label for e in nodes):
+                nodes.append({'name': entity, 'label': label})
+        for subject, predicate, obj in relations:
+            existing = next((rel for rel in relationships
+                             if rel['source'] == subject and rel['target'] == obj and rel['type'] == predicate), None)
+            if not existing:
+                relationships.append({'source': subject, 'target': obj, 'type': predicate, 'weight': 1})
+    return nodes, relationships
+
+def _insert_with_indexes(extracted):
+    builder = KnowledgeGraphBuilder()
+    for entities, relations in extracted:
+        builder.create_nodes(entities)
+        builder.create_relationships(relations)
+    return builder.entities['nodes'], builder.entities['relationships']
+
+def bench_graph_build(data_dir=DATA_DIR, scales=(1, 2, 4)):
+    documents = _load_corpus(data_dir)
+    builder = KnowledgeGraphBuilder()
+    start = time.perf_counter()
+    extracted = list(builder.extract_batch(documents))
+    print(f"Extracted {len(documents)} documents in {time.perf_counter() - start:.2f}s")
+
+    # Repeating the corpus adds duplicates as well as volume, like a growing news archive
+    for scale in scales:
+        items = extracted * scale
+        count = sum(len(entities) + len(relations) for entities, relations in items)
+        for name, insert in (('scan', _insert_with_scans), ('index', _insert_with_indexes)):
+            start = time.perf_counter()
+            nodes, relationships = insert(items)
+            elapsed = time.perf_counter() - start
+            print(f"x{scale} {name:>5}: {count} items -> {len(nodes)} nodes, "
+                  f"{len(relationships)} relationships in {elapsed * 1000:.1f} ms")
+
+def _synthetic_graph(n_nodes, n_relationships, seed=0):
+    # Preferential attachment, so a few hub entities carry most edges as in extracted graphs
+    rng = np.random.default_rng(seed)
+    popularity = rng.pareto(1.5, n_nodes) + 1
+    popularity /= popularity.sum()
+    ends = rng.choice(n_nodes, size=(n_relationships, 2), p=popularity)
+    nodes = [{'name': f"entity {i}", 'label': 'ORG'} for i in range(n_nodes)]
+    relationships = [{'source': f"entity {s}", 'target': f"entity {t}", 'type': 'related',
+                      'weight': float(w)} for (s, t), w in zip(ends, rng.integers(1, 4, n_relationships))]
+    return nodes, relationships
+
+def _related_with_dicts(adjacency, labels, start, depth):
+    # The dict-of-lists BFS the CSR arrays replace, returning the same rows
+    paths = {start: []}
+    frontier = [start]
+    results = []
+    for _ in range(depth):
+        next_frontier = []
+        for name in frontier:
+            for neighbor, rel in adjacency.get(name, []):
+                if neighbor not in paths:
+                    paths[neighbor] = paths[name] + [rel]
+                    next_frontier.append(neighbor)
+                    results.append({'related': {'name': neighbor, 'label': labels.get(neighbor)}, 'r': paths[neighbor]})
+        frontier = next_frontier
+    return results
+
+def bench_graph_query(sizes=((1000, 3000), (20000, 100000), (100000, 500000)), n_queries=200, depth=2):
+    # Mean time of find_related_entities, find_shortest_path and the query-context
+    # neighborhood on the local engine, next to a dict-of-lists BFS over the same graph
+    from graph_query import LocalGraphQuery
+    for n_nodes, n_relationships in sizes:
+        nodes, relationships = _synthetic_graph(n_nodes, n_relationships)
+        start = time.perf_counter()
+        graph = LocalGraphQuery(nodes, relationships)
+        build_seconds = time.perf_counter() - start
+        labels = {node['name']: node['label'] for node in nodes}
+        adjacency = {}
+        for rel in relationships:
+            adjacency.setdefault(rel['source'], []).append((rel['target'], rel))
+        rng = np.random.default_rng(1)
+        names = [nodes[i]['name'] for i in rng.integers(n_nodes, size=2 * n_queries)]
+        starts, ends = names[:n_queries], names[n_queries:]
+
+        def mean_us(call):
+            call(0)  # Lazy imports and cached arrays are not part of a query
+            start = time.perf_counter()
+            for i in range(n_queries):
+                call(i)
+            return (time.perf_counter() - start) / n_queries * 1e6
+
+        graph.find_entities = lambda query: [query]
+        timings = {
+            'related csr': mean_us(lambda i: graph.find_related_entities(starts[i], depth)),
+            'related dict': mean_us(lambda i: _related_with_dicts(adjacency, labels, starts[i], depth)),
+            'neighborhood': mean_us(lambda i: graph.neighborhood(starts[i], depth)),
+            'shortest path': mean_us(lambda i: graph.find_shortest_path(starts[i], ends[i])),
+        }
+        print(f"{n_nodes} nodes, {n_relationships} relationships: built in {build_seconds:.2f}s")
+        for name, micros in timings.items():
+            print(f"  {name:<14} {micros:10.1f} us/query")
+
+def _synthetic_embeddings(n, d=384, clusters=200, seed=0):
+    # Normalized vectors around random topic centers, closer to sentence embeddings than noise
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, d)).astype('float32')
+    vectors = centers[rng.integers(clusters, size=n)] + 0.6 * rng.standard_normal((n, d)).astype('float32')
+    faiss.normalize_L2(vectors)
+    return vectors
+
+def _stored_embeddings(store_path):
+    if not os.path.exists(store_path):
+        return None
+    store = data_loader.EmbeddingStore(store_path)
+    ids = sorted(i for ids in store.keys.values() for i in ids)
+    return np.array(store.vectors[ids]) if ids else None
+
+def _measure(index, queries, truth, k):
+    latencies = []
+    found = []
+    for query in queries:
+        start = time.perf_counter()
+        _, indices = index.search(query[None, :], k)
+        latencies.append(time.perf_counter() - start)
+        found.append(indices[0])
+    latencies = np.array(latencies) * 1000
+    return index_factory.recall_at_k(np.array(found), truth), np.percentile(latencies, 50), np.percentile(latencies, 99)
+
+def bench_index(sizes=(1000, 10000, 50000), n_queries=200, k=10, store_path=EMBEDDINGS_PATH):
+    # recall@k against exact search and single-query p50/p99 latency for each index type,
+    # on the stored passage embeddings and on synthetic corpora of the given sizes
+    corpora = [(f"synthetic {n}", _synthetic_embeddings(n + n_queries)) for n in sizes]
+    stored = _stored_embeddings(store_path)
+    if stored is not None and len(stored) > n_queries:
+        corpora.insert(0, ("stored passages", stored))
+
+    for name, vectors in corpora:
+        # Held-out queries, so no query finds itself at rank one
+        queries, vectors = vectors[:n_queries], vectors[n_queries:]
+        n, d = vectors.shape
+        ids = np.arange(n, dtype='int64')
+        truth = index_factory.exact_neighbors(vectors, ids, queries, k)
+        chosen = index_factory.choose_spec(n, d)
+        specs = list(dict.fromkeys([
+            chosen,
+            index_factory.choose_spec(n, d, 'flat'),
+            index_factory.choose_spec(n, d, 'ivf'),
+            index_factory.choose_spec(n, d, 'ivf', 'sq8'),
+            index_factory.choose_spec(n, d, 'ivf', 'pq'),
+            index_factory.choose_spec(n, d, 'hnsw'),
+        ]))
+        print(f"{name}: {n} vectors, {d} dimensions, chosen index {chosen}")
+        for spec in specs:
+            start = time.perf_counter()
+            index = index_factory.build_index(vectors, ids, spec)
+            params = index_factory.tune_search(index, vectors, ids, k)
+            index_factory.apply_search_params(index, params)
+            build_seconds = time.perf_counter() - start
+            recall, p50, p99 = _measure(index, queries, truth, k)
+            tuned = ', '.join(f"{key}={value}" for key, value in params.items() if key != 'recall')
+            print(f"  {spec:<22} build {build_seconds:7.2f}s  recall@{k} {recall:.3f}  "
+                  f"p50 {p50:6.3f} ms  p99 {p99:6.3f} ms  {tuned}")
+
+def _interpreter_seconds(code, runs):
+    # Best wall time of a fresh interpreter running code from this directory
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', code], check=True, cwd=APP_DIR, capture_output=True)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+def _slowest_imports(module, top):
+    # The module's direct imports by cumulative time, from python -X importtime. Its output
+    # lists children before their parent, indented two spaces per level.
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            cwd=APP_DIR, capture_output=True, text=True, check=True)
+    children = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        if depth == 1:
+            children.append((int(cumulative) / 1e6, name.strip()))
+        elif depth == 0:
+            if name.strip() == module:
+                return sorted(children, reverse=True)[:top]
+            children = []
+    return []
+
+def bench_import(modules=('rag_app', 'data_loader', 'retriever', 'knowledge_graph', 'gemini_api'), runs=3, top=5):
+    # Cold-start time of importing each module in a fresh interpreter, minus the interpreter's
+    # own start-up, with the slowest imports it pulls in
+    baseline = _interpreter_seconds('pass', runs)
+    print(f"interpreter start-up: {baseline * 1000:.0f} ms")
+    for module in modules:
+        elapsed = max(_interpreter_seconds(f'import {module}', runs) - baseline, 0.0)
+        print(f"import {module}: {elapsed * 1000:.0f} ms")
+        for seconds, name in _slowest_imports(module, top):
+            print(f"  {name:<28} {seconds * 1000:7.1f} ms")
+
+BENCHMARKS = {
+    'graph': bench_graph_build,
+    'graph_query': bench_graph_query,
+    'index': bench_index,
+    'import': bench_import,
+}
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        print(f"--- {name} ---")
+        BENCHMARKS[name]()
@@ -3,68 +3,90 @@ import faiss
 import numpy as np
 import json
 import pickle
-import pandas as pd
-from pypdf import PdfReader
-from sentence_transformers import SentenceTransformer
+from encoder import DEFAULT_MODEL, get_encoder
 from knowledge_graph import KnowledgeGraphBuilder
-from datetime import datetime
+import doc_store
+import index_factory
+from sparse_index import BM25Index
+from metadata_index import MetadataIndex, find_pairs, normalize_pair, parse_timestamp
 import hashlib
+import re
+import itertools
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 
-from graph_query import GraphQuery
+def build_knowledge_graph(documents, export_to_csv=False, csv_dir=None, batch_size=64, n_process=None,
+                          state_path=None, removed_paths=()):
+    # With a state_path the graph is updated incrementally: only documents whose content
+    # changed are extracted, and removed or replaced files have their contributions retracted.
+    if state_path and os.path.exists(state_path):
+        graph_builder = KnowledgeGraphBuilder.load_state(state_path)
+    else:
+        graph_builder = KnowledgeGraphBuilder()
 
-def build_knowledge_graph(documents, export_to_csv=False, csv_dir=None):
-    if not documents:
-        print("No documents to build knowledge graph")
-        return [], []
-    
-     # Filter out documents from specific paths and with specific filenames
-    filtered_documents = []
-    excluded_dirs = ['/indexes', '/strategies']
-    excluded_files = ['docks.pkl', 'file_tracker.json', 'index.faiss']
+    changed = graph_builder.remove_documents(normalize_path(path) for path in removed_paths)
 
-    for doc in documents:
-        # Check if the document's path is in excluded directories
-        if not isinstance(doc, dict) or 'path' not in doc or 'content' not in doc:
-            continue
-        # Check if the document's path is in excluded directories
-        if any(excluded_dir in doc['path'] for excluded_dir in excluded_dirs):
-            continue
-        # Check if the document's filename is in excluded files
-        if os.path.basename(doc['path']) in excluded_files:
-            continue
-        filtered_documents.append(doc)
-    
-    if not filtered_documents:
-        print("No valid documents found after filtering.")
-        return [], []
-    
-    graph_builder = KnowledgeGraphBuilder()
-    
-    for doc in filtered_documents:
-        entities = graph_builder.extract_entities(doc['content'])
-        relationships = graph_builder.extract_relationships(doc['content'])
-        
-        # Add entities and relationships to the graph without duplication
-        for entity, label in entities:
-            if not any(e['name'] == entity and e['label'] == label for e in graph_builder.entities["nodes"]):
-                graph_builder.create_nodes([(entity, label)])
-        
-        for subject, predicate, obj in relationships:
-            existing_rel = next((rel for rel in graph_builder.entities["relationships"] 
-                                if rel['source'] == subject and rel['target'] == obj and rel['type'] == predicate), None)
-            if not existing_rel:
-                graph_builder.create_relationships([(subject, predicate, obj)])
+    # documents may be a generator, it is consumed as extraction goes and only the head used
+    # to size the worker pool is read ahead
+    pending = _graph_documents(documents, graph_builder)
+    head = list(itertools.islice(pending, batch_size * (os.cpu_count() or 1)))
+    if not head and not changed:
+        if not graph_builder.provenance:
+            print("No documents to build knowledge graph")
+            return [], []
+        print("Knowledge graph is up to date.")
+        return graph_builder.entities.get("nodes", []), graph_builder.entities.get("relationships", [])
+
+    if n_process is None:
+        # One worker per full batch, worker start-up isn't worth it for a handful of documents
+        n_process = max(1, min(os.cpu_count() or 1, len(head) // batch_size))
+
+    items, texts = itertools.tee(itertools.chain(head, pending))
+    extracted = graph_builder.extract_batch(
+        (content for _, _, content in texts),
+        batch_size=batch_size,
+        n_process=n_process
+    )
+    count = 0
+    for (path, doc_hash, _), (entities, relationships) in zip(items, extracted):
+        # The builder deduplicates nodes and counts repeated relationships in their weight
+        graph_builder.add_document(path, doc_hash, entities, relationships)
+        count += 1
+    print(f"Extracted entities and relationships from {count} documents.")
+
+    if state_path:
+        graph_builder.save_state(state_path)
 
     # Export to CSV if requested
     if export_to_csv:
         if not csv_dir:
-            csv_dir = "graph_visualization_files"
+            csv_dir = os.path.join("data", "graph_visualization_files")
         graph_builder.export_to_csv(csv_dir)
         print(f"Graph data exported to {csv_dir}")
 
     # Return entities and relationships instead of exporting to CSV or uploading to Neo4j
     return graph_builder.entities.get("nodes", []), graph_builder.entities.get("relationships", [])
 
+def _graph_documents(documents, graph_builder):
+    # Filter out documents from specific paths and with specific filenames
+    excluded_dirs = ['/indexes', '/strategies']
+    excluded_files = ['docks.pkl', 'file_tracker.json', 'index.faiss']
+
+    for doc in documents:
+        if not isinstance(doc, dict) or 'path' not in doc or 'content' not in doc:
+            continue
+        path = normalize_path(doc['path'])
+        # Check if the document's path is in excluded directories
+        if any(excluded_dir in path for excluded_dir in excluded_dirs):
+            continue
+        # Check if the document's filename is in excluded files
+        if os.path.basename(path) in excluded_files:
+            continue
+        doc_hash = content_hash(doc['content'])
+        if graph_builder.has_document(path, doc_hash):
+            continue  # Already extracted from this exact content
+        yield path, doc_hash, doc['content']
+
 def _read_any_file(file_path):
     if file_path.endswith('.txt'):
         return _read_text_file(file_path)
@@ -79,8 +101,11 @@ def _read_any_file(file_path):
 
 def _read_pdf_file(file_path):
     try:
+        from pypdf import PdfReader
         pdf = PdfReader(file_path)
-        content = '\n'.join(page.extract_text() for page in pdf.pages if page.extract_text()).strip()
+        # extract_text re-parses the page's content stream, so each page is extracted once
+        pages = (page.extract_text() for page in pdf.pages)
+        content = '\n'.join(text for text in pages if text).strip()
         return content if content else None
     except Exception as e:
         print(f"Failed to read PDF at {file_path}: {e}")
@@ -90,25 +115,27 @@ def _read_json_file(file_path):
     try:
         with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
             data = json.load(f)
-        
-        content = []
-        if isinstance(data, dict):
-            for key, value in data.items():
-                content.append(f"{key.capitalize()}: {value}")
-        elif isinstance(data, list):
-            for item in data:
-                if isinstance(item, dict):
-                    item_content = [f"{k.capitalize()}: {v}" for k, v in item.items()]
-                    content.append(' '.join(item_content))
-                else:
-                    content.append(str(item))
-        else:
-            content.append(str(data))
-        return '\n'.join(content)
+        return _json_text(data)
     except Exception as e:
         print(f"JSON reading error: {e}")
         return None
 
+def _json_text(data):
+    content = []
+    if isinstance(data, dict):
+        for key, value in data.items():
+            content.append(f"{key.capitalize()}: {value}")
+    elif isinstance(data, list):
+        for item in data:
+            if isinstance(item, dict):
+                item_content = [f"{k.capitalize()}: {v}" for k, v in item.items()]
+                content.append(' '.join(item_content))
+            else:
+                content.append(str(item))
+    else:
+        content.append(str(data))
+    return '\n'.join(content)
+
 def _read_text_file(file_path):
     try:
         with open(file_path, 'r', encoding='utf-8') as f:
@@ -119,89 +146,623 @@ def _read_text_file(file_path):
 
 def _read_excel_file(file_path):
     try:
-        excel_file = pd.ExcelFile(file_path)
-        texts = []
-        for sheet_name in excel_file.sheet_names:
-            sheet = excel_file.parse(sheet_name)
-            sheet_data = sheet.astype(str).values  # Convert all data to strings
-            text = '\n'.join('\t'.join(row) for row in sheet_data)  # Join rows with tabs and lines with newlines
-            texts.append(text)
-        return '\n'.join(texts)  # Combine all sheets
+        if file_path.endswith('.xls'):
+            return _read_xls_file(file_path)
+        from openpyxl import load_workbook
+        # Read-only mode streams rows from the sheet XML instead of building every cell
+        workbook = load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            lines = []
+            for sheet in workbook.worksheets:
+                for row in sheet.iter_rows(values_only=True):
+                    if any(value is not None for value in row):
+                        # Join rows with tabs and lines with newlines
+                        lines.append('\t'.join('' if value is None else str(value) for value in row))
+            return '\n'.join(lines)  # Combine all sheets
+        finally:
+            workbook.close()
     except Exception as e:
         print(f"Error reading Excel file at {file_path}: {e}")
         return None
 
-def track_file_changes(folder_path, tracker_file):
+def _read_xls_file(file_path):
+    # openpyxl can't read the legacy binary format, pandas hands it to xlrd
+    import pandas as pd
+    texts = []
+    for sheet in pd.read_excel(file_path, sheet_name=None, header=None, dtype=str).values():
+        texts.append('\n'.join('\t'.join(row) for row in sheet.fillna('').values))
+    return '\n'.join(texts)
+
+def news_metadata(article):
+    text = f"{article.get('title') or ''} {article.get('content') or ''}"
+    # Stored pairs are whatever the fetcher's regex caught, so they are re-validated
+    return {
+        'type': 'news',
+        'pairs': find_pairs(' '.join(article.get('pairs') or []) + ' ' + text),
+        'source': article.get('source'),
+        'published_at': parse_timestamp(article.get('publishedAt') or '')
+    }
+
+def news_documents(rows):
+    # Documents for (segment path, byte offset, article) rows of the news store. The offset
+    # names the article within its append-only segment: "data/news_store/news_20250409.jsonl#1234"
+    for path, offset, article in rows:
+        yield {
+            'path': f"{normalize_path(path)}#{offset}",
+            'content': _json_text(article),
+            'meta': news_metadata(article)
+        }
+
+def source_path(path):
+    # File a document came from, without the row suffix of news store documents
+    return path.split('#', 1)[0]
+
+# "20250225_180038_213070_USDJPYc_bounce.txt" and "20250225_180038_NZDUSDc_bearish.txt"
+_REPORT_STAMP_RE = re.compile(r'(\d{8}_\d{6}(?:_\d{6})?)_')
+
+def read_metadata(file_path):
+    # Filterable attributes of a source file: news articles carry their pairs and publishedAt,
+    # strategy reports their Symbol and Timestamp lines
+    meta = {'type': os.path.splitext(file_path)[1].lstrip('.').lower() or 'other', 'pairs': []}
+    try:
+        if file_path.endswith('.json'):
+            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+                data = json.load(f)
+            if isinstance(data, dict) and ('publishedAt' in data or 'pairs' in data):
+                meta = news_metadata(data)
+        elif file_path.endswith('.txt'):
+            with open(file_path, 'r', encoding='utf-8') as f:
+                fields = dict(line.split(':', 1) for line in f.read().splitlines() if ':' in line)
+            fields = {key.strip().lower(): value.strip() for key, value in fields.items()}
+            if 'symbol' in fields and 'strategy' in fields:
+                # Only bounce reports have a Timestamp line, every report name starts with one
+                stamp = _REPORT_STAMP_RE.match(os.path.basename(file_path))
+                published_at = parse_timestamp(fields.get('timestamp', ''))
+                if published_at is None and stamp:
+                    published_at = parse_timestamp(stamp.group(1))
+                meta.update({
+                    'type': 'strategy',
+                    'pairs': [normalize_pair(fields['symbol'])],
+                    'strategy': fields['strategy'],
+                    'published_at': published_at
+                })
+    except Exception as e:
+        print(f"Metadata read error for {file_path}: {e}")
+    return meta
+
+def load_document(file_path):
+    content = _read_any_file(file_path)
+    if not content:
+        return None
+    return {'path': file_path, 'content': content, 'meta': read_metadata(file_path)}
+
+def iter_documents(file_paths, max_workers=None, max_pending=None):
+    # Parses files on a process pool, the readers are CPU bound, and yields documents in input
+    # order. At most max_pending parsed documents are held at once, however many files there are.
+    file_paths = list(file_paths)
+    max_workers = max_workers or min(os.cpu_count() or 1, len(file_paths))
+    if max_workers <= 1:
+        for file_path in file_paths:
+            document = load_document(file_path)
+            if document is not None:
+                yield document
+        return
+
+    paths = iter(file_paths)
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        pending = deque(executor.submit(load_document, path)
+                        for path in itertools.islice(paths, max_pending or 2 * max_workers))
+        while pending:
+            document = pending.popleft().result()
+            next_path = next(paths, None)
+            if next_path is not None:
+                pending.append(executor.submit(load_document, next_path))
+            if document is not None:
+                yield document
+
+def batched(items, size):
+    items = iter(items)
+    while batch := list(itertools.islice(items, size)):
+        yield batch
+
+def track_file_changes(folder_path, tracker_file, max_workers=None):
+    # Returns (new_files, deleted_files). The tracker maps relative posix paths to
+    # {size, mtime_ns, hash}; only files whose size or mtime changed are hashed again, and a
+    # file touched without changing its content is not reported.
+    tracked = {}
     if os.path.exists(tracker_file):
         with open(tracker_file, 'r') as f:
-            tracked = json.load(f)
-    else:
-        tracked = {}
-
-    new_files = []
-    current_hashes = {}
+            for path, entry in json.load(f).items():
+                if isinstance(entry, str):
+                    # Older trackers stored only the hash, under the OS's own path separators
+                    entry = {'size': None, 'mtime_ns': None, 'hash': entry}
+                tracked[normalize_path(path)] = entry
 
-    excluded_dirs = ['/indexes', '/strategies']
+    # The news store is read in bulk from its own watermark. Strategy reports are indexed
+    # for retrieval, only the knowledge graph leaves them out.
+    excluded_dirs = ['/indexes', '/news_store']
     excluded_files = ['docks.pkl', 'file_tracker.json', 'index.faiss']
 
+    current = {}
+    to_hash = []
     for root, _, files in os.walk(folder_path):
-        if any(excluded_dir in root for excluded_dir in excluded_dirs):
+        if any(excluded_dir in normalize_path(root) for excluded_dir in excluded_dirs):
             continue
         for file in files:
             if file.endswith(('.txt', '.pdf', '.json', '.xlsx', '.xls')):
-                file_path = os.path.join(root, file)
                 if file in excluded_files:
                     continue
-                current_hash = _compute_hash(file_path)
-                current_hashes[file_path] = current_hash
-                if file_path not in tracked or tracked.get(file_path, None) != current_hash:
-                    new_files.append(file_path)
+                file_path = normalize_path(os.path.relpath(os.path.join(root, file)))
+                stat = os.stat(file_path)
+                entry = tracked.get(file_path)
+                if entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+                    current[file_path] = entry
+                else:
+                    current[file_path] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'hash': None}
+                    to_hash.append(file_path)
+
+    # Hashing is I/O bound and hashlib releases the GIL on large buffers
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for file_path, digest in zip(to_hash, executor.map(_compute_hash, to_hash)):
+            current[file_path]['hash'] = digest
 
-    # Update the tracker file
-    with open(tracker_file, 'w') as f:
-        json.dump(current_hashes, f, indent=4)
+    new_files = [path for path in to_hash if tracked.get(path, {}).get('hash') != current[path]['hash']]
+    deleted_files = sorted(set(tracked) - set(current))
 
-    return new_files
+    # Written to a temporary file first so a crash never leaves a truncated tracker
+    tmp_path = tracker_file + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(current, f, indent=4)
+    os.replace(tmp_path, tracker_file)
+
+    return new_files, deleted_files
 
 def _compute_hash(file_path):
     sha256_hash = hashlib.sha256()
     with open(file_path, "rb") as f:
-        while chunk := f.read(8192):
+        while chunk := f.read(1 << 20):
             sha256_hash.update(chunk)
     return sha256_hash.hexdigest()
 
-def build_faiss_index(documents, model='all-MiniLM-L6-v2'):
+def build_faiss_index(documents, model=DEFAULT_MODEL):
     if not documents:
         raise ValueError("No documents provided.")
-    embedder = SentenceTransformer(model)
-    embeddings = embedder.encode(
-        documents,
-        show_progress_bar=True,
-        convert_to_numpy=True,
-        num_workers=4  # Parallel processing
-    ).astype('float32')
-    faiss.normalize_L2(embeddings)
-    
-    d = embeddings.shape[1]
-    nlist = min(100, len(documents))  # Adjust the number of clusters based on the number of documents
-    quantizer = faiss.IndexFlatIP(d)
-    index = faiss.IndexIVFFlat(quantizer, d, nlist, faiss.METRIC_INNER_PRODUCT)
-    
-    n_samples = min(10000, len(documents))
-    if n_samples < nlist:
-        print(f"Warning: Training samples {n_samples} < clusters {nlist}. Reducing clusters to {n_samples}.")
-        index = faiss.IndexIVFFlat(quantizer, d, max(n_samples, 1), faiss.METRIC_INNER_PRODUCT)
-    
-    train_embeddings = embeddings[np.random.choice(embeddings.shape[0], n_samples, replace=False), :]
-    index.train(train_embeddings)
-    
-    index.add(embeddings)
-    return index
-
-def save_documents(documents, file_path='data/indexes/documents.pkl'):
-    os.makedirs(os.path.dirname(file_path), exist_ok=True)
-    with open(file_path, 'wb') as f:
-        pickle.dump(documents, f)
-
-def load_documents(file_path='data/indexes/documents.pkl'):
-    return pickle.load(open(file_path, 'rb'))
\ No newline at end of file
+    texts = [doc['content'] if isinstance(doc, dict) else doc for doc in documents]
+    embeddings = get_encoder(model).encode(texts, show_progress_bar=True)
+    return _build_index(embeddings, np.arange(len(texts), dtype='int64'))[0]
+
+def _build_index(embeddings, ids, index_type=None, compression=None, flat_threshold=index_factory.FLAT_THRESHOLD):
+    # Exact search for small corpora, IVF or HNSW beyond flat_threshold, with nprobe or
+    # efSearch set to the smallest value reaching the target recall
+    spec = index_factory.choose_spec(len(embeddings), embeddings.shape[1], index_type, compression, flat_threshold)
+    index = index_factory.build_index(embeddings, ids, spec)
+    params = dict(index_factory.tune_search(index, embeddings, ids), spec=spec)
+    if params['recall'] < index_factory.RECALL_TARGET and ',PQ' in spec:
+        # PQ codes can cap recall below the target however many lists are probed, SQ8 keeps
+        # the lists and compresses less
+        fallback = index_factory.choose_spec(len(embeddings), embeddings.shape[1], index_type, 'sq8', flat_threshold)
+        print(f"Warning: {spec} reaches recall@10 {params['recall']:.3f} at best, "
+              f"below the {index_factory.RECALL_TARGET} target; using {fallback} instead.")
+        index = index_factory.build_index(embeddings, ids, fallback)
+        params = dict(index_factory.tune_search(index, embeddings, ids), spec=fallback, requested_spec=spec)
+    if params['recall'] < index_factory.RECALL_TARGET:
+        print(f"Warning: {params['spec']} reaches recall@10 {params['recall']:.3f} at best, "
+              f"below the {index_factory.RECALL_TARGET} target.")
+    index_factory.apply_search_params(index, params)
+    return index, params
+
+def normalize_path(path):
+    # Trackers and document stores written on Windows use backslash separators
+    return path.replace('\\', '/')
+
+def content_hash(text):
+    return hashlib.sha256(text.encode('utf-8', errors='ignore')).hexdigest()
+
+# Word pieces and punctuation, a slight undercount of the MiniLM wordpiece tokenizer
+_TOKEN_RE = re.compile(r'\w+|[^\w\s]')
+
+def chunk_document(doc, max_tokens=160, overlap=32):
+    # Split a document into overlapping passages that fit the embedding model's
+    # 256 wordpiece window. Each passage keeps its character span in the document.
+    text = doc['content']
+    spans = [m.span() for m in _TOKEN_RE.finditer(text)]
+    if not spans:
+        return []
+    doc_hash = content_hash(text)
+    step = max(max_tokens - overlap, 1)
+    passages = []
+    for chunk, first in enumerate(range(0, len(spans), step)):
+        last = min(first + max_tokens, len(spans)) - 1
+        start, end = spans[first][0], spans[last][1]
+        passages.append({
+            'path': doc['path'],
+            'content': text[start:end],
+            'start': start,
+            'end': end,
+            'chunk': chunk,
+            'doc_hash': doc_hash,
+            'meta': doc.get('meta') or {}
+        })
+        if last == len(spans) - 1:
+            break
+    return passages
+
+def documents_from_passages(passages):
+    # Stitch passages back into whole documents using their offsets, yielding each document
+    # once its last passage has passed. A document's passages are stored next to each other.
+    # Documents stored before chunking have no offsets and are returned unchanged.
+    parts = []
+    for passage in passages:
+        if passage is None:
+            continue
+        if parts and (passage.get('path'), passage.get('doc_hash')) != (parts[0]['path'], parts[0].get('doc_hash')):
+            yield _stitch(parts)
+            parts = []
+        if 'start' not in passage:
+            yield {'path': passage['path'], 'content': passage['content']}
+            continue
+        parts.append(passage)
+    if parts:
+        yield _stitch(parts)
+
+def _stitch(parts):
+    text = ''
+    for passage in sorted(parts, key=lambda p: p['chunk']):
+        if passage['start'] > len(text):
+            text += ' ' * (passage['start'] - len(text))
+        if passage['end'] > len(text):
+            text += passage['content'][len(text) - passage['start']:]
+    return {'path': parts[0]['path'], 'content': text, 'meta': parts[0].get('meta')}
+
+class EmbeddingStore:
+    # Row i of the vector file is the embedding of passage id i; `keys` maps the (path, content
+    # hash) of a source document to the ids of its passages. Rows are written to the file as
+    # they are embedded and read back memory-mapped, the pickle records how many rows and
+    # document store records the last commit covered.
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.vectors_path = os.path.splitext(file_path)[0] + '.f32'
+        self.keys = {}
+        self.trained_size = 0
+        self.dim = None
+        self.rows = 0
+        self.doc_count = None  # Document store length at the last commit, None before this existed
+        self._view = None
+        if os.path.exists(file_path):
+            with open(file_path, 'rb') as f:
+                state = pickle.load(f)
+            # Stores written before chunking mapped each key to a single document id
+            self.keys = {key: ids for key, ids in state['keys'].items() if isinstance(ids, list)}
+            self.trained_size = state.get('trained_size', 0)
+            self.doc_count = state.get('doc_count')
+            if state.get('vectors') is not None:
+                # Older stores pickled the whole matrix, it moves to the vector file
+                self.replace(np.asarray(state['vectors'], dtype='float32'))
+            else:
+                self.dim, self.rows = state.get('dim'), state.get('rows', 0)
+
+    @property
+    def vectors(self):
+        if self.dim is None or self.rows == 0:
+            return None
+        if self._view is None:
+            self._view = np.memmap(self.vectors_path, dtype='float32', mode='r', shape=(self.rows, self.dim))
+        return self._view
+
+    def size(self):
+        return sum(len(ids) for ids in self.keys.values())
+
+    def write(self, passage_ids, vectors):
+        # Passage ids are handed out in order, so a batch is normally one contiguous write;
+        # other ids are written row by row
+        vectors = np.ascontiguousarray(vectors, dtype='float32')
+        if not len(vectors):
+            return
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+        self._view = None
+        passage_ids = np.asarray(passage_ids, dtype='int64')
+        mode = 'r+b' if os.path.exists(self.vectors_path) else 'w+b'
+        with open(self.vectors_path, mode) as f:
+            if np.array_equal(passage_ids, passage_ids[0] + np.arange(len(passage_ids))):
+                f.seek(int(passage_ids[0]) * self.dim * 4)
+                f.write(vectors.tobytes())
+            else:
+                for passage_id, vector in zip(passage_ids, vectors):
+                    f.seek(int(passage_id) * self.dim * 4)
+                    f.write(vector.tobytes())
+        self.rows = max(self.rows, int(passage_ids.max()) + 1)
+
+    def replace(self, vectors):
+        # Rewrites the file with vectors as rows 0..n-1, used when the index is compacted
+        vectors = np.ascontiguousarray(vectors, dtype='float32')
+        self._view = None
+        os.makedirs(os.path.dirname(self.vectors_path) or '.', exist_ok=True)
+        tmp_path = self.vectors_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(vectors.tobytes())
+        os.replace(tmp_path, self.vectors_path)
+        self.dim = vectors.shape[1] if vectors.ndim == 2 and vectors.shape[1] else self.dim
+        self.rows = len(vectors)
+
+    def clear(self):
+        self.keys = {}
+        self.rows = 0
+        self._view = None
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.file_path), exist_ok=True)
+        if os.path.exists(self.vectors_path):
+            with open(self.vectors_path, 'rb+') as f:
+                os.fsync(f.fileno())
+        tmp_path = self.file_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump({
+                'keys': self.keys,
+                'dim': self.dim,
+                'rows': self.rows,
+                'doc_count': self.doc_count,
+                'trained_size': self.trained_size
+            }, f)
+        os.replace(tmp_path, self.file_path)
+
+class IncrementalIndexer:
+    # Keeps index.idx, the document store and the embedding store in sync so that a run
+    # only chunks and embeds new or changed documents. Removed passages become tombstones
+    # in the document store until the next full retrain compacts them away.
+    def __init__(self, index_path, doc_path, store_path, model=DEFAULT_MODEL, drift_ratio=0.5,
+                 chunk_tokens=160, chunk_overlap=32, sparse_path=None, metadata_path=None,
+                 index_type=None, compression=None, flat_threshold=index_factory.FLAT_THRESHOLD, encoder=None):
+        self.index_path = index_path
+        self.doc_path = doc_path
+        self.sparse_path = sparse_path
+        self.metadata_path = metadata_path
+        self.model = model
+        self.drift_ratio = drift_ratio
+        self.chunk_tokens = chunk_tokens
+        self.chunk_overlap = chunk_overlap
+        self.index_type = index_type
+        self.compression = compression
+        self.flat_threshold = flat_threshold
+        self.store = EmbeddingStore(store_path)
+        self.encoder = encoder or get_encoder(model)
+
+        self.doc_store = load_documents(doc_path)
+        self.batch = []  # Passages of the batch being embedded, their ids continue after the document store
+        self.added_ids = []
+        self.removed_ids = set()
+        self.error = None
+        self.index = faiss.read_index(index_path) if os.path.exists(index_path) else None
+        self.params = index_factory.load_params(index_path)
+        if sparse_path and os.path.exists(sparse_path):
+            self.sparse = BM25Index.load(sparse_path)
+        else:
+            self.sparse = BM25Index()
+        if metadata_path and os.path.exists(metadata_path):
+            self.metadata = MetadataIndex.load(metadata_path)
+        else:
+            self.metadata = MetadataIndex()
+
+        # Passages appended by a run that never committed are dropped, their ids stay taken
+        if self.store.doc_count is not None and len(self.doc_store) > self.store.doc_count:
+            uncommitted = np.arange(self.store.doc_count, len(self.doc_store))
+            self.doc_store.delete(uncommitted[self.doc_store.offsets[uncommitted, 1] > 0])
+
+        self.path_keys = {}
+        for key in self.store.keys:
+            self.path_keys.setdefault(key[0], []).append(key)
+
+        # Indexes from before the embedding store or chunking existed are rebuilt once
+        live = len(self.doc_store.live_ids())
+        self.needs_rebuild = (
+            self.index is None
+            or self.store.size() != live
+            or self.index.ntotal != live
+        )
+        if self.needs_rebuild and live:
+            print("Embedding store out of sync with the index, re-embedding all documents.")
+            self.removed_ids.update(int(doc_id) for doc_id in self.doc_store.live_ids())
+            self.store.clear()
+            self.path_keys = {}
+            self.sparse = BM25Index()
+            self.metadata = MetadataIndex()
+            # Re-embedded passages are appended behind the old ones, which the commit compacts away
+            stored = len(self.doc_store)
+            passages = (self.doc_store[doc_id] for doc_id in range(stored))
+            for batch in batched(self._unique_documents(documents_from_passages(passages)), 64):
+                self.add(batch)
+            return
+        if len(self.sparse) != live:
+            # Postings are rebuilt from the stored passages, nothing needs re-embedding
+            print("Building BM25 index from the document store...")
+            self.sparse = BM25Index()
+            for passage_id in self.doc_store.live_ids():
+                self.sparse.add(int(passage_id), self.doc_store[passage_id]['content'])
+        if len(self.metadata) != live:
+            print("Building metadata index from the document store...")
+            self.metadata = MetadataIndex()
+            file_meta = {}
+            for passage_id in self.doc_store.live_ids():
+                passage = self.doc_store[passage_id]
+                meta = passage.get('meta')
+                if meta is None:
+                    # Passages stored before metadata existed, read it from the source file
+                    if passage['path'] not in file_meta:
+                        file_meta[passage['path']] = self._file_metadata(passage['path'])
+                    meta = file_meta[passage['path']]
+                self.metadata.add(int(passage_id), meta)
+
+    @staticmethod
+    def _unique_documents(documents):
+        seen = set()
+        for doc in documents:
+            doc['path'] = normalize_path(doc['path'])
+            # Older runs stored a modified file twice, newest copy first
+            if doc['path'] != 'unknown' and doc['path'] in seen:
+                continue
+            seen.add(doc['path'])
+            yield doc
+
+    def _file_metadata(self, path):
+        return read_metadata(path) if '#' not in path and os.path.exists(path) else {}
+
+    def _get(self, passage_id):
+        if passage_id in self.removed_ids:
+            return None
+        if passage_id < len(self.doc_store):
+            return self.doc_store[passage_id]
+        return self.batch[passage_id - len(self.doc_store)]
+
+    def _live_ids(self):
+        return [int(doc_id) for doc_id in self.doc_store.live_ids() if doc_id not in self.removed_ids]
+
+    def paths(self):
+        return list(self.path_keys)
+
+    def documents(self):
+        # Live passages read one at a time from the document store
+        for passage_id in self._live_ids():
+            yield self.doc_store[passage_id]
+
+    def remove(self, paths):
+        for path in paths:
+            for key in self.path_keys.pop(normalize_path(path), []):
+                for passage_id in self.store.keys.pop(key, []):
+                    passage = self._get(passage_id)
+                    if passage is not None:
+                        self.sparse.remove(passage_id, passage['content'])
+                    self.metadata.remove(passage_id)
+                    self.removed_ids.add(passage_id)
+
+    def add(self, documents):
+        # Chunks and embeds a batch of documents. The passages go straight to the document store
+        # and their vectors to the embedding store, so nothing of earlier batches stays in memory.
+        pending = []
+        self.batch = []
+        for doc in documents:
+            path = normalize_path(doc['path'])
+            key = (path, content_hash(doc['content']))
+            if key in self.store.keys:
+                continue  # Unchanged since it was last embedded
+            if path != 'unknown':
+                self.remove([path])  # Modified file, replace its previous version
+            meta = doc.get('meta')
+            if meta is None:
+                meta = self._file_metadata(path)
+            passage_ids = []
+            for passage in chunk_document({'path': path, 'content': doc['content'], 'meta': meta},
+                                          self.chunk_tokens, self.chunk_overlap):
+                passage_id = len(self.doc_store) + len(self.batch)
+                self.batch.append(passage)
+                self.sparse.add(passage_id, passage['content'])
+                self.metadata.add(passage_id, meta)
+                passage_ids.append(passage_id)
+            self.store.keys[key] = passage_ids
+            self.path_keys.setdefault(path, []).append(key)
+            pending.extend(passage_ids)
+
+        if not pending:
+            return
+        embeddings = self.encoder.encode([passage['content'] for passage in self.batch], show_progress_bar=True)
+        # Ids are only taken once the batch is embedded, a failed batch leaves no records
+        self.store.write(pending, embeddings)
+        self.doc_store.append(self.batch)
+        self.batch = []
+        self.added_ids.extend(pending)
+
+    def add_stream(self, documents, batch_size=64):
+        # Embeds documents a batch at a time as they stream past and yields them on, so the
+        # graph builder can consume the same stream. After a failure the remaining documents
+        # are passed through unindexed and the exception is kept in self.error.
+        self.error = None
+        for batch in batched(documents, batch_size):
+            if self.error is None:
+                try:
+                    self.add(batch)
+                except Exception as e:
+                    self.error = e
+            yield from batch
+
+    def _drifted(self):
+        live = self.store.size()
+        trained = self.store.trained_size
+        if trained == 0 or abs(live - trained) > self.drift_ratio * trained:
+            return True
+        # Crossing flat_threshold, or a configuration change, calls for another index type
+        spec = index_factory.choose_spec(live, self.store.dim, self.index_type,
+                                         self.compression, self.flat_threshold)
+        built_for = self.params.get('requested_spec', self.params.get('spec'))
+        return index_factory.spec_family(spec) != index_factory.spec_family(built_for)
+
+    def commit(self):
+        live_ids = self._live_ids()
+        if not live_ids:
+            raise ValueError("No documents provided.")
+
+        # HNSW graphs can't drop entries, so removals rebuild them
+        cannot_remove = self.removed_ids and not index_factory.supports_remove(self.index)
+        if self.needs_rebuild or cannot_remove or self._drifted():
+            # Compact tombstones away and retrain the index on the current corpus
+            print(f"Training FAISS index on {len(live_ids)} passages...")
+            remap = {old_id: new_id for new_id, old_id in enumerate(live_ids)}
+            vectors = np.array(self.store.vectors[live_ids])
+            self.store.replace(vectors)
+            self.store.keys = {key: [remap[i] for i in ids] for key, ids in self.store.keys.items()}
+            self.sparse.remap(remap)
+            self.metadata.remap(remap)
+            # Live passages are copied into a new store next to the current one, then swapped in
+            compact_path = self.doc_path + '.compact'
+            save_documents((self.doc_store[passage_id] for passage_id in live_ids), compact_path)
+            self.doc_store.close()
+            doc_store.move_store(compact_path, self.doc_path)
+            self.index, self.params = _build_index(vectors, np.arange(len(live_ids), dtype='int64'),
+                                                   self.index_type, self.compression, self.flat_threshold)
+            print(f"Built {self.params['spec']} index, recall@10 {self.params['recall']:.3f}.")
+            self.store.trained_size = len(live_ids)
+            self.needs_rebuild = False
+        else:
+            removed = sorted(self.removed_ids)
+            if removed:
+                self.index.remove_ids(np.array(removed, dtype='int64'))
+            added = [passage_id for passage_id in self.added_ids if passage_id not in self.removed_ids]
+            if added:
+                self.index.add_with_ids(self.store.vectors[added], np.array(added, dtype='int64'))
+            # Passages added and replaced within this run become tombstones as well
+            if removed:
+                self.doc_store.delete(removed)
+            print(f"Updated FAISS index: {len(added)} passages added, {len(removed)} removed.")
+
+        # Written to a temporary file first so a reader never maps a half-written index
+        tmp_path = self.index_path + '.tmp'
+        faiss.write_index(self.index, tmp_path)
+        os.replace(tmp_path, self.index_path)
+        index_factory.save_params(self.index_path, self.params)
+        self.doc_store = load_documents(self.doc_path)
+        self.store.doc_count = len(self.doc_store)
+        self.store.save()
+        if self.sparse_path:
+            self.sparse.save(self.sparse_path)
+        if self.metadata_path:
+            self.metadata.save(self.metadata_path)
+
+        self.added_ids, self.removed_ids = [], set()
+        return self.index
+
+def save_documents(documents, file_path='data/indexes/docs'):
+    doc_store.write_documents(documents, file_path)
+
+def load_documents(file_path='data/indexes/docs'):
+    # A pickled document list (docs.pkl) left by older versions is migrated on first load
+    base_path = file_path[:-len('.pkl')] if file_path.endswith('.pkl') else file_path
+    legacy_path = base_path + '.pkl'
+    if not doc_store.store_exists(base_path) and os.path.exists(legacy_path):
+        print(f"Migrating {legacy_path} to a memory-mapped document store...")
+        with open(legacy_path, 'rb') as f:
+            documents = pickle.load(f)
+        if documents and isinstance(documents[0], str):
+            documents = [{'content': doc, 'path': 'unknown'} for doc in documents]
+        for doc in documents:
+            if doc is not None:
+                doc['path'] = normalize_path(doc['path'])
+        save_documents(documents, base_path)
+    return doc_store.DocumentStore(base_path)
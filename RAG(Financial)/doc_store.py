@@ -0,0 +1,105 @@
+import os
+import json
+import mmap
+import numpy as np
+
+def store_files(base_path):
+    return base_path + '.bin', base_path + '.offsets.npy'
+
+def store_exists(base_path):
+    return all(os.path.exists(path) for path in store_files(base_path))
+
+def _encode_records(documents, f, position):
+    rows = []
+    for doc in documents:
+        if doc is None:
+            rows.append((position, 0))  # Tombstone, keeps the ids of later records stable
+            continue
+        record = json.dumps(doc, ensure_ascii=False).encode('utf-8')
+        f.write(record)
+        rows.append((position, len(record)))
+        position += len(record)
+    return np.array(rows, dtype='int64').reshape(-1, 2)
+
+def _write_offsets(offsets, offsets_path):
+    tmp_path = offsets_path + '.tmp.npy'
+    np.save(tmp_path, offsets)
+    os.replace(tmp_path, offsets_path)
+
+def write_documents(documents, base_path):
+    # Rewrites the whole store, used for migration and compaction
+    blob_path, offsets_path = store_files(base_path)
+    os.makedirs(os.path.dirname(blob_path) or '.', exist_ok=True)
+    with open(blob_path + '.tmp', 'wb') as f:
+        offsets = _encode_records(documents, f, 0)
+    os.replace(blob_path + '.tmp', blob_path)
+    _write_offsets(offsets, offsets_path)
+
+def move_store(src_base, dst_base):
+    # Replaces the store at dst_base with the one written at src_base; close readers of
+    # dst_base first, Windows can't replace a mapped file
+    for src, dst in zip(store_files(src_base), store_files(dst_base)):
+        os.replace(src, dst)
+
+class DocumentStore:
+    # Passages are stored as UTF-8 JSON records in one contiguous blob with an
+    # (offset, length) row per passage id. Both files are memory-mapped, so fetching
+    # passage i reads only that record. Deleted passages keep their row with length 0.
+    def __init__(self, base_path):
+        self.base_path = base_path
+        self.blob_path, self.offsets_path = store_files(base_path)
+        self.offsets = np.zeros((0, 2), dtype='int64')
+        self._blob_file = None
+        self._blob = None
+        self._open()
+
+    def _open(self):
+        self.close()
+        if os.path.exists(self.offsets_path):
+            self.offsets = np.load(self.offsets_path, mmap_mode='r')
+        if os.path.exists(self.blob_path) and os.path.getsize(self.blob_path) > 0:
+            self._blob_file = open(self.blob_path, 'rb')
+            self._blob = mmap.mmap(self._blob_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def close(self):
+        if self._blob is not None:
+            self._blob.close()
+            self._blob = None
+        if self._blob_file is not None:
+            self._blob_file.close()
+            self._blob_file = None
+        self.offsets = np.zeros((0, 2), dtype='int64')
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __getitem__(self, doc_id):
+        start, length = self.offsets[doc_id]
+        if length == 0:
+            return None
+        return json.loads(self._blob[start:start + length].decode('utf-8'))
+
+    def __iter__(self):
+        for doc_id in range(len(self)):
+            yield self[doc_id]
+
+    def live_ids(self):
+        return np.flatnonzero(self.offsets[:, 1] > 0)
+
+    def _replace_offsets(self, offsets):
+        # Windows can't replace a mapped file, so the mapping is dropped for the in-memory
+        # rows before the new file goes in, then mapped again
+        self.offsets = offsets
+        _write_offsets(offsets, self.offsets_path)
+        self._open()
+
+    def append(self, documents):
+        # New records go to the end of the blob, readers that mapped it earlier are unaffected
+        with open(self.blob_path, 'ab') as f:
+            rows = _encode_records(documents, f, f.tell())
+        self._replace_offsets(np.concatenate([self.offsets, rows]))
+
+    def delete(self, doc_ids):
+        offsets = np.array(self.offsets)
+        offsets[np.asarray(list(doc_ids), dtype='int64'), 1] = 0
+        self._replace_offsets(offsets)
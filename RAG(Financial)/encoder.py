@@ -0,0 +1,114 @@
+import os
+import sqlite3
+import hashlib
+import threading
+import numpy as np
+
+DEFAULT_MODEL = 'all-MiniLM-L6-v2'
+PRECISIONS = ('float32', 'float16', 'int8')
+
+class Encoder:
+    # One SentenceTransformer shared by ingestion and queries, loaded on the first encode.
+    # Passage embeddings are cached in SQLite under a hash of the model, precision and text,
+    # so identical texts (reposted articles, repeated strategy reports) are encoded once.
+    # float16 halves the model's memory on a GPU; int8 applies dynamic quantization to its
+    # linear layers for CPU inference.
+    def __init__(self, model_name=DEFAULT_MODEL, batch_size=64, precision='float32', cache_path=None, device=None):
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unsupported precision {precision}, expected one of {PRECISIONS}")
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.precision = precision
+        self.device = device
+        self.model = None
+        self.lock = threading.Lock()
+        self.stats = {'encoded': 0, 'cached': 0}
+
+        self.conn = None
+        if cache_path:
+            os.makedirs(os.path.dirname(cache_path) or '.', exist_ok=True)
+            self.conn = sqlite3.connect(cache_path, check_same_thread=False)
+            self.conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, embedding BLOB)")
+            self.conn.commit()
+
+    def _load(self):
+        with self.lock:
+            if self.model is None:
+                # Imported here, torch alone takes seconds and query-only runs may never encode
+                from sentence_transformers import SentenceTransformer
+                kwargs = {'device': self.device} if self.device else {}
+                model = SentenceTransformer(self.model_name, **kwargs)
+                if self.precision == 'float16':
+                    model = model.half()
+                elif self.precision == 'int8':
+                    import torch
+                    model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+                self.model = model
+        return self.model
+
+    def _key(self, text):
+        return hashlib.sha256(f"{self.model_name}\0{self.precision}\0{text}".encode('utf-8', errors='ignore')).hexdigest()
+
+    def _lookup(self, keys):
+        found = {}
+        unique = list(set(keys))
+        for start in range(0, len(unique), 500):  # Stay under SQLite's bound parameter limit
+            batch = unique[start:start + 500]
+            rows = self.conn.execute(
+                f"SELECT key, embedding FROM embeddings WHERE key IN ({','.join('?' * len(batch))})", batch
+            ).fetchall()
+            found.update((key, np.frombuffer(blob, dtype='float32')) for key, blob in rows)
+        return found
+
+    def _encode(self, texts, show_progress_bar=False):
+        embeddings = self._load().encode(
+            texts,
+            batch_size=self.batch_size,
+            show_progress_bar=show_progress_bar,
+            convert_to_numpy=True
+        ).astype('float32')
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        embeddings /= np.maximum(norms, 1e-12)
+        self.stats['encoded'] += len(texts)
+        return embeddings
+
+    def encode(self, texts, show_progress_bar=False, cache=True):
+        # L2-normalized float32 embeddings, one row per text
+        if not texts:
+            return np.zeros((0, 0), dtype='float32')
+        if self.conn is None or not cache:
+            return self._encode(list(texts), show_progress_bar)
+
+        keys = [self._key(text) for text in texts]
+        found = self._lookup(keys)
+        pending = {}
+        for key, text in zip(keys, texts):
+            if key not in found:
+                pending.setdefault(key, text)
+        if pending:
+            embeddings = self._encode(list(pending.values()), show_progress_bar)
+            rows = list(zip(pending, (vector.tobytes() for vector in embeddings)))
+            self.conn.executemany("INSERT OR REPLACE INTO embeddings (key, embedding) VALUES (?, ?)", rows)
+            self.conn.commit()
+            found.update(zip(pending, embeddings))
+        self.stats['cached'] += len(texts) - len(pending)
+        return np.vstack([found[key] for key in keys])
+
+    def encode_query(self, text):
+        # Queries are rarely repeated word for word, the answer cache covers those that are
+        return self.encode([text], cache=False)
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+_encoders = {}
+_encoders_lock = threading.Lock()
+
+def get_encoder(model_name=DEFAULT_MODEL, **kwargs):
+    # Process-wide encoder per model, the options of the first call win
+    with _encoders_lock:
+        if model_name not in _encoders:
+            _encoders[model_name] = Encoder(model_name, **kwargs)
+        return _encoders[model_name]
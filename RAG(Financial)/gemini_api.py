@@ -1,35 +1,91 @@
 import os
-import requests
-import tiktoken
+import json
+import time
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from http_client import get_transport
 from dotenv import load_dotenv
 
 load_dotenv()
 
+MAX_CONTEXT_TOKENS = 32768
+
+class AnswerError(str):
+    # A message in place of an answer (no API key, no candidates, a failed request). It
+    # prints like any answer but callers can tell it apart, e.g. to keep it out of the cache.
+    pass
+
+@lru_cache(maxsize=None)
+def get_tokenizer():
+    # Loading the BPE ranks is far slower than encoding a prompt, do it once per process
+    import tiktoken
+    return tiktoken.get_encoding('cl100k_base')
+
 class GeminiClient:
-    def __init__(self):
+    def __init__(self, base_url=None, timeout=60, max_workers=4, transport=None, token_cache_size=10000):
         self.api_key = os.getenv("GOOGLE_AI_STUDIO_API_KEY")
-        self.base_url = 'https://generativelanguage.googleapis.com/v1beta'
+        # Overridable so tests can point the client at a local stub of generateContent
+        self.base_url = base_url or os.getenv("GEMINI_BASE_URL", 'https://generativelanguage.googleapis.com/v1beta')
         self.model = 'gemini-1.5-flash'
+        self.timeout = timeout
+
+        # Pooled keep-alive connections, retries and the circuit breaker live in the transport
+        self.transport = transport or get_transport()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.token_counts = {}  # document id -> token count
+        self.token_cache_size = token_cache_size
+
+    def _count_tokens(self, doc, limit, doc_id=None):
+        # Exact token count, or limit + 1 once the document is known not to fit
+        if doc_id is not None and doc_id in self.token_counts:
+            return self.token_counts[doc_id]
+        tokenizer = get_tokenizer()
+        # A token covers at most a few dozen characters in practice, so a prefix is
+        # enough to tell that a long document won't fit
+        prefix = doc[:(limit + 2) * 32]
+        count = len(tokenizer.encode(prefix))
+        if len(prefix) < len(doc):
+            if count > limit + 1:
+                return limit + 1
+            count = len(tokenizer.encode(doc))
+        if doc_id is not None:
+            if len(self.token_counts) >= self.token_cache_size:
+                self.token_counts.clear()
+            self.token_counts[doc_id] = count
+        return count
 
-    def trim_context(self, docs):
-        tokenizer = tiktoken.get_encoding('cl100k_base')
-        combined = '\n'.join(docs)
-        encoded = tokenizer.encode(combined)
-        max_tokens = 32768
-        return tokenizer.decode(encoded[:max_tokens]) if encoded else ''
+    def trim_context(self, docs, max_tokens=MAX_CONTEXT_TOKENS, doc_ids=None):
+        # Packs whole documents in the given (relevance) order until the next one would
+        # exceed the budget. Only a first document that is over budget on its own is cut.
+        tokenizer = get_tokenizer()
+        packed = []
+        used = 0
+        for i, doc in enumerate(docs):
+            if not doc:
+                continue
+            remaining = max_tokens - used - (1 if packed else 0)  # '\n' separator
+            if remaining <= 0:
+                break
+            count = self._count_tokens(doc, remaining, doc_ids[i] if doc_ids else None)
+            if count <= remaining:
+                packed.append(doc)
+                used += count + (1 if len(packed) > 1 else 0)
+                continue
+            if not packed:
+                encoded = tokenizer.encode(doc[:(remaining + 2) * 32])
+                packed.append(tokenizer.decode(encoded[:remaining]))
+            break
+        return '\n'.join(packed)
 
-    def generate_answer(self, query, context_docs):
+    def _build_payload(self, query, context_docs, doc_ids=None):
         if not self.api_key:
-            return "API key not found."
+            return None, AnswerError("API key not found.")
         
-        context = self.trim_context(context_docs)
+        context = self.trim_context(context_docs, doc_ids=doc_ids)
         if not context:
-            return "No valid context found."
+            return None, AnswerError("No valid context found.")
 
         prompt = f"Answer the query \"{query}\" using the context:\n\n{context}\n\nYour response (start of reply):"
-
-        headers = {"Content-Type": "application/json"}
-        endpoint = f"{self.base_url}/models/{self.model}:generateContent?key={self.api_key}"
         payload = {
             "contents": [{"parts": [{"text": prompt}]}],
             "generation_config": {
@@ -37,19 +93,75 @@ class GeminiClient:
                 "max_output_tokens": 8192
             }
         }
+        return payload, None
+
+    def generate_answer(self, query, context_docs, timeout=None, doc_ids=None, deadline=None):
+        headers = {"Content-Type": "application/json"}
+        endpoint = f"{self.base_url}/models/{self.model}:generateContent?key={self.api_key}"
 
         try:
-            response = requests.post(endpoint, headers=headers, json=payload)
+            # Token counting can fail too (e.g. tiktoken's BPE file can't be fetched)
+            payload, error = self._build_payload(query, context_docs, doc_ids)
+            if error:
+                return error
+            response = self.transport.post(endpoint, headers=headers, json=payload, timeout=timeout or self.timeout,
+                                           deadline=deadline)
             response.raise_for_status()
             response_json = response.json()
             candidates = response_json.get('candidates', [])
             if candidates:
                 content = candidates[0].get('content', {})
-                return content.get('parts', [{}])[0].get('text', 'No answer.')
+                text = content.get('parts', [{}])[0].get('text')
+                return text if text else AnswerError('No answer.')
             else:
-                return 'No answer.'
+                return AnswerError('No answer.')
+        except Exception as e:
+            return AnswerError(f"Error generating answer: {str(e)}")
+
+    def stream_answer(self, query, context_docs, timeout=None, doc_ids=None):
+        # Yields text chunks from the streamGenerateContent SSE endpoint as they arrive
+        headers = {"Content-Type": "application/json"}
+        endpoint = f"{self.base_url}/models/{self.model}:streamGenerateContent?alt=sse&key={self.api_key}"
+
+        try:
+            payload, error = self._build_payload(query, context_docs, doc_ids)
+            if error:
+                yield error
+                return
+            with self.transport.post(endpoint, headers=headers, json=payload, stream=True,
+                                   timeout=timeout or self.timeout) as response:
+                response.raise_for_status()
+                for line in response.iter_lines(decode_unicode=True):
+                    if not line or not line.startswith('data:'):
+                        continue
+                    event = json.loads(line[len('data:'):])
+                    for candidate in event.get('candidates', [])[:1]:
+                        for part in candidate.get('content', {}).get('parts', []):
+                            if part.get('text'):
+                                yield part['text']
         except Exception as e:
-            return f"Error generating answer: {str(e)}"
+            yield AnswerError(f"Error generating answer: {str(e)}")
+
+    def submit_answer(self, query, context_docs, timeout=None, doc_ids=None):
+        # Starts generate_answer on the pool so independent answer paths overlap. The call,
+        # retries included, has until timeout after submission, then the worker is free again.
+        deadline = time.monotonic() + (timeout or self.timeout)
+        future = self.executor.submit(self.generate_answer, query, context_docs, timeout, doc_ids, deadline)
+        future.deadline = deadline
+        return future
+
+    def wait_for_answer(self, future, timeout=None):
+        if timeout is None:
+            timeout = max(getattr(future, 'deadline', time.monotonic() + self.timeout) - time.monotonic(), 0)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            # Drops the call if it hasn't started; a running one gives up at its deadline
+            future.cancel()
+            return AnswerError("Error generating answer: timed out.")
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
     
     def generate_answer_from_graph(self, query, graph_results):
         if not graph_results:
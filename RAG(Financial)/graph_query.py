@@ -1,7 +1,12 @@
-from neo4j import GraphDatabase
+import os
+import csv
+import numpy as np
+from knowledge_graph import GraphIndex
 
 class GraphQuery:
     def __init__(self, uri, user, password):
+        # Imported here so the local backend works without the Neo4j driver installed
+        from neo4j import GraphDatabase
         self.driver = GraphDatabase.driver(uri, auth=(user, password))
     
     def close(self):
@@ -30,6 +35,113 @@ class GraphQuery:
         parameters = {"start": start_entity, "end": end_entity}
         return self.query(query, parameters)
 
+class LocalGraphQuery(GraphIndex):
+    # In-process drop-in for GraphQuery's Neo4j methods over the exported CSVs or the builder
+    # output, traversing the CSR arrays of the GraphIndex rag_app uses for graph context
+    def __init__(self, nodes, relationships):
+        super().__init__(nodes, relationships)
+        display_names = {}
+        for node in nodes:
+            display_names.setdefault(node['name'].lower(), node['name'])
+        for rel in self.relationships:
+            for name in (rel['source'], rel['target']):
+                display_names.setdefault(name.lower(), name)
+        self.display_names = [display_names[name] for name in self.names]
+        self.labels = [self.nodes[name][0]['label'] if name in self.nodes else None for name in self.names]
+        self._matrix = None
+
+    @classmethod
+    def from_csv(cls, directory=os.path.join("data", "graph_visualization_files")):
+        with open(os.path.join(directory, "nodes.csv"), newline='', encoding='utf-8') as f:
+            nodes = list(csv.DictReader(f))
+        with open(os.path.join(directory, "relationships.csv"), newline='', encoding='utf-8') as f:
+            relationships = [dict(rel, weight=float(rel['weight'])) for rel in csv.DictReader(f)]
+        return cls(nodes, relationships)
+
+    @classmethod
+    def from_builder(cls, builder):
+        return cls(builder.entities.get("nodes", []), builder.entities.get("relationships", []))
+
+    def close(self):
+        pass
+
+    def query(self, query, parameters=None):
+        raise NotImplementedError("Cypher queries need the Neo4j backend (GRAPH_BACKEND=neo4j); "
+                                  "use neighborhood() for the relationships around a text query")
+
+    def _node_id(self, name):
+        return self.ids.get(name.lower())
+
+    def _node(self, node_id):
+        return {'name': self.display_names[node_id], 'label': self.labels[node_id]}
+
+    def find_related_entities(self, entity_name, depth=2):
+        # Depth-limited BFS along outgoing edges, one row per reachable entity with the
+        # relationships on the path that first reached it
+        start = self._node_id(entity_name)
+        if start is None:
+            return []
+        _, targets, rel_ids = self.out_edges
+        visited = np.zeros(len(self.names), dtype=bool)
+        visited[start] = True
+        frontier = np.array([start], dtype='int64')
+        paths = {start: []}
+        results = []
+        for _ in range(depth):
+            sources, positions = self._expand(self.out_edges, frontier)
+            neighbors = targets[positions]
+            _, first = np.unique(neighbors, return_index=True)
+            first = np.sort(first)
+            first = first[~visited[neighbors[first]]]
+            frontier = neighbors[first]
+            if not len(frontier):
+                break
+            visited[frontier] = True
+            for node_id, parent, rel_id in zip(frontier.tolist(), sources[first].tolist(),
+                                               rel_ids[positions[first]].tolist()):
+                paths[node_id] = paths[parent] + [self.relationships[rel_id]]
+                results.append({'related': self._node(node_id), 'r': paths[node_id]})
+        return results
+
+    def _weight_matrix(self):
+        # The undirected CSR arrays as a sparse matrix for scipy's Dijkstra, keeping the
+        # lightest of parallel relationships between two entities
+        if self._matrix is None:
+            from scipy.sparse import csr_matrix
+            offsets, targets, rel_ids = self.all_edges
+            sources = np.repeat(np.arange(len(self.names)), np.diff(offsets))
+            weights = self.weights[rel_ids]
+            order = np.lexsort((weights, targets, sources))
+            sources, targets, weights = sources[order], targets[order], weights[order]
+            first = np.ones(len(order), dtype=bool)
+            first[1:] = (sources[1:] != sources[:-1]) | (targets[1:] != targets[:-1])
+            self._matrix = csr_matrix((weights[first], (sources[first], targets[first])),
+                                      shape=(len(self.names), len(self.names)))
+        return self._matrix
+
+    def find_shortest_path(self, start_entity, end_entity):
+        # Dijkstra with the relationship weight as cost, as apoc.algo.dijkstra does, over
+        # edges in both directions like the undirected RELATED_TO* expansion
+        start, end = self._node_id(start_entity), self._node_id(end_entity)
+        if start is None or end is None:
+            return []
+        from scipy.sparse.csgraph import dijkstra
+        distances, previous = dijkstra(self._weight_matrix(), indices=start, return_predecessors=True)
+        if not np.isfinite(distances[end]):
+            return []
+        path = [end]
+        while path[-1] != start:
+            path.append(int(previous[path[-1]]))
+        return [{'path': [self._node(node_id) for node_id in reversed(path)], 'weight': float(distances[end])}]
+
+def open_graph(backend=None, csv_dir=os.path.join("data", "graph_visualization_files"), uri=None, user=None, password=None):
+    # GRAPH_BACKEND=neo4j selects the Aura/Neo4j driver, anything else the in-process CSR engine
+    backend = backend or os.getenv("GRAPH_BACKEND", "local")
+    if backend == "neo4j":
+        return GraphQuery(uri or os.getenv("NEO4J_URI"), user or os.getenv("NEO4J_USER"),
+                          password or os.getenv("NEO4J_PASSWORD"))
+    return LocalGraphQuery.from_csv(csv_dir)
+
 # Usage
 if __name__ == "__main__":
     # Replace with your Aura connection details
@@ -0,0 +1,200 @@
+import time
+import random
+import threading
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+
+# Rate limiting and transient server errors are worth another attempt
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+class CircuitOpenError(requests.RequestException):
+    pass
+
+class CircuitBreaker:
+    # Opens after failure_threshold consecutive failures and lets a single trial request
+    # through once reset_timeout has passed. Transports are shared across thread pools, so
+    # state changes happen under a lock and only one caller wins the half-open trial.
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.lock = threading.Lock()
+
+    def allow(self):
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.opened_at = time.monotonic()  # Half-open, the next failure re-opens it
+                return True
+            return False
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+def _endpoint(url):
+    # Scheme, host and path only, so API keys in the query string never reach the stats
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}{parts.path}"
+
+def _retry_after(response):
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+class HttpTransport:
+    # Shared outbound HTTP: a keep-alive connection pool, connect/read timeouts, retries with
+    # jittered exponential backoff that honors Retry-After, a circuit breaker per endpoint
+    # and per-endpoint latency counters.
+    def __init__(self, connect_timeout=5.0, read_timeout=60.0, max_retries=3, backoff_base=0.5,
+                 backoff_max=30.0, pool_maxsize=10, failure_threshold=5, reset_timeout=30.0):
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_maxsize, pool_maxsize=pool_maxsize)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self.lock = threading.Lock()
+        self.breakers = {}
+        self.stats = {}
+
+    def _breaker(self, endpoint):
+        with self.lock:
+            if endpoint not in self.breakers:
+                self.breakers[endpoint] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+            return self.breakers[endpoint]
+
+    def _record(self, endpoint, elapsed, failed=False, retried=False):
+        with self.lock:
+            stats = self.stats.setdefault(endpoint, {
+                'requests': 0, 'failures': 0, 'retries': 0, 'total_seconds': 0.0, 'max_seconds': 0.0
+            })
+            stats['requests'] += 1
+            stats['failures'] += int(failed)
+            stats['retries'] += int(retried)
+            stats['total_seconds'] += elapsed
+            stats['max_seconds'] = max(stats['max_seconds'], elapsed)
+
+    def _backoff(self, attempt):
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def _timeout(self, timeout):
+        if timeout is None:
+            return (self.connect_timeout, self.read_timeout)
+        if isinstance(timeout, tuple):
+            return timeout
+        return (self.connect_timeout, timeout)
+
+    def _remaining(self, deadline):
+        if deadline is None:
+            return None
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise requests.Timeout("Deadline passed before the request could complete")
+        return remaining
+
+    def request(self, method, url, timeout=None, deadline=None, **kwargs):
+        # A single number for timeout sets the read timeout; latency is measured up to the
+        # response headers, so streamed bodies don't skew it. deadline (a time.monotonic()
+        # value) bounds the whole call: each attempt's timeouts and the backoff sleeps are
+        # cut to the time left, and no retry starts after it.
+        endpoint = _endpoint(url)
+        breaker = self._breaker(endpoint)
+        if not breaker.allow():
+            raise CircuitOpenError(f"Circuit open for {endpoint} after repeated failures")
+
+        for attempt in range(self.max_retries + 1):
+            last_attempt = attempt == self.max_retries
+            attempt_timeout = self._timeout(timeout)
+            remaining = self._remaining(deadline)
+            if remaining is not None:
+                attempt_timeout = tuple(min(value, remaining) for value in attempt_timeout)
+            start = time.perf_counter()
+            try:
+                response = self.session.request(method, url, timeout=attempt_timeout, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                delay = self._backoff(attempt)
+                last_attempt = last_attempt or self._out_of_time(deadline, delay)
+                self._record(endpoint, time.perf_counter() - start, failed=True, retried=not last_attempt)
+                if last_attempt:
+                    breaker.record_failure()
+                    raise
+                time.sleep(delay)
+                continue
+
+            failed = response.status_code in RETRY_STATUSES
+            delay = None
+            if failed and not last_attempt:
+                delay = _retry_after(response)
+                delay = min(delay, self.backoff_max) if delay is not None else self._backoff(attempt)
+                if self._out_of_time(deadline, delay):
+                    last_attempt = True
+            self._record(endpoint, time.perf_counter() - start, failed=failed, retried=failed and not last_attempt)
+            if failed and not last_attempt:
+                response.close()
+                time.sleep(delay)
+                continue
+
+            if failed:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+            return response
+
+    @staticmethod
+    def _out_of_time(deadline, delay):
+        # A retry after delay would start past the deadline
+        return deadline is not None and time.monotonic() + delay >= deadline
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def latency_stats(self):
+        with self.lock:
+            return {
+                endpoint: dict(stats, mean_seconds=stats['total_seconds'] / stats['requests'])
+                for endpoint, stats in self.stats.items()
+            }
+
+    def close(self):
+        self.session.close()
+
+_transport = None
+_transport_lock = threading.Lock()
+
+def get_transport():
+    # Process-wide transport so every client shares one connection pool
+    global _transport
+    with _transport_lock:
+        if _transport is None:
+            _transport = HttpTransport()
+        return _transport
@@ -0,0 +1,146 @@
+import os
+import re
+import json
+import numpy as np
+import faiss
+
+# Below this many passages an exact search is fast enough and has perfect recall
+FLAT_THRESHOLD = 10000
+HNSW_NEIGHBORS = 32
+TRAIN_SEED = 1234
+RECALL_TARGET = 0.95
+
+def params_path(index_path):
+    return index_path + '.json'
+
+def _pq_subquantizers(d):
+    # About 8 dimensions per sub-quantizer, which must divide d
+    return next(m for m in range(max(d // 8, 1), 0, -1) if d % m == 0)
+
+def choose_spec(n, d, index_type=None, compression=None, flat_threshold=FLAT_THRESHOLD):
+    # index_factory string for n vectors of dimension d. index_type forces 'flat', 'ivf' or
+    # 'hnsw'; compression ('sq8' or 'pq') only applies to the approximate indexes.
+    if index_type == 'flat' or (index_type is None and n < flat_threshold):
+        return 'IDMap2,Flat'
+    if index_type == 'hnsw':
+        # HNSW has no product-quantized storage that keeps ids, SQ8 is its compressed form
+        return f'IDMap2,HNSW{HNSW_NEIGHBORS}' + (',SQ8' if compression else '')
+    nlist = max(1, min(int(4 * np.sqrt(n)), n // 39))  # At least 39 training points per list
+    if compression == 'pq' and n < 256 * 39:
+        compression = 'sq8'  # Too few vectors to train 256 centroids per sub-quantizer
+    codec = {'sq8': 'SQ8', 'pq': f'PQ{_pq_subquantizers(d)}'}.get(compression, 'Flat')
+    return f'IVF{nlist},{codec}'
+
+def spec_family(spec):
+    # The list count grows with the corpus; only a change of index type forces a rebuild
+    return re.sub(r'\d+', '', spec) if spec else None
+
+def _ivf(index):
+    try:
+        return faiss.extract_index_ivf(index)
+    except RuntimeError:
+        return None
+
+def _hnsw(index):
+    if isinstance(index, faiss.IndexIDMap):
+        index = faiss.downcast_index(index.index)
+    return index.hnsw if isinstance(index, faiss.IndexHNSW) else None
+
+def supports_remove(index):
+    # remove_ids is not implemented for HNSW graphs
+    return _hnsw(index) is None
+
+def build_index(embeddings, ids, spec, seed=TRAIN_SEED):
+    # Training samples are drawn with a fixed seed, so the same corpus gives the same index
+    index = faiss.index_factory(embeddings.shape[1], spec, faiss.METRIC_INNER_PRODUCT)
+    if not index.is_trained:
+        ivf = _ivf(index)
+        n_train = len(embeddings) if ivf is None else min(len(embeddings), 256 * ivf.nlist)
+        if ivf is not None:
+            ivf.cp.seed = seed
+        rng = np.random.default_rng(seed)
+        index.train(embeddings[np.sort(rng.choice(len(embeddings), n_train, replace=False))])
+    index.add_with_ids(embeddings, ids)
+    return index
+
+def apply_search_params(index, params):
+    ivf, hnsw = _ivf(index), _hnsw(index)
+    if ivf is not None and 'nprobe' in params:
+        ivf.nprobe = params['nprobe']
+    if hnsw is not None and 'efSearch' in params:
+        hnsw.efSearch = params['efSearch']
+
+def search_parameters(index, selector=None, exhaustive=False):
+    # Per-query parameters carrying an id selector; exhaustive probes every inverted list
+    ivf, hnsw = _ivf(index), _hnsw(index)
+    if ivf is not None:
+        return faiss.SearchParametersIVF(sel=selector, nprobe=ivf.nlist if exhaustive else ivf.nprobe)
+    if hnsw is not None:
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=hnsw.efSearch)
+    return faiss.SearchParameters(sel=selector)
+
+def recall_at_k(found, truth):
+    k = truth.shape[1]
+    return float(np.mean([len(set(f[f >= 0].tolist()) & set(t.tolist())) / k for f, t in zip(found, truth)]))
+
+def exact_neighbors(embeddings, ids, queries, k):
+    exact = faiss.IndexFlatIP(embeddings.shape[1])
+    exact.add(embeddings)
+    _, positions = exact.search(queries, k)
+    return np.asarray(ids)[positions]
+
+def tune_search(index, embeddings, ids, k=10, target=RECALL_TARGET, n_queries=200, seed=TRAIN_SEED, queries=None):
+    # Smallest nprobe or efSearch whose recall@k against exact search reaches target, or the
+    # largest one tried when none does. Without held-out queries a sample of the indexed
+    # passages is used, each with itself left out of both result lists. Exact indexes have
+    # nothing to tune.
+    ivf, hnsw = _ivf(index), _hnsw(index)
+    if ivf is None and hnsw is None:
+        return {'recall': 1.0}
+    k = min(k, len(embeddings) - (queries is None))
+    ids = np.asarray(ids)
+    if queries is None:
+        rng = np.random.default_rng(seed)
+        positions = rng.choice(len(embeddings), min(n_queries, len(embeddings)), replace=False)
+        queries, own_ids = embeddings[positions], ids[positions]
+        truth = _drop_own(exact_neighbors(embeddings, ids, queries, k + 1), own_ids, k)
+    else:
+        own_ids = None
+        truth = exact_neighbors(embeddings, ids, queries, k)
+
+    if ivf is not None:
+        name, values = 'nprobe', [v for v in (1, 2, 4, 8, 16, 32, 64, 128, 256, 512) if v < ivf.nlist] + [ivf.nlist]
+    else:
+        name, values = 'efSearch', [v for v in (16, 32, 64, 128, 256, 512) if v >= k]
+    params = {}
+    for value in values:
+        params = {name: value}
+        apply_search_params(index, params)
+        if own_ids is None:
+            _, found = index.search(queries, k)
+        else:
+            _, found = index.search(queries, k + 1)
+            found = _drop_own(found, own_ids, k)
+        params['recall'] = recall_at_k(found, truth)
+        if params['recall'] >= target:
+            break
+    return params
+
+def _drop_own(found, own_ids, k):
+    # First k results of each row other than the query's own id, padded with -1
+    rows = [[i for i in row if i != own][:k] for row, own in zip(found.tolist(), own_ids.tolist())]
+    return np.array([row + [-1] * (k - len(row)) for row in rows], dtype='int64')
+
+def load_params(index_path):
+    path = params_path(index_path)
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def save_params(index_path, params):
+    path = params_path(index_path)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(params, f, indent=4)
+    os.replace(tmp_path, path)
@@ -1,53 +1,168 @@
 import os
 import csv
-import en_core_web_sm  # SpaCy model for NER
+import pickle
+import numpy as np
+from functools import lru_cache
 from collections import defaultdict
 
-nlp = en_core_web_sm.load()
+@lru_cache(maxsize=None)
+def get_nlp():
+    # Loading the spaCy model takes seconds, so only runs that extract or match entities pay for it
+    import en_core_web_sm  # SpaCy model for NER
+    return en_core_web_sm.load()
+
+# Components each kind of extraction needs, everything else is disabled while parsing
+ENTITY_PIPES = {"ner"}
+RELATIONSHIP_PIPES = {"parser"}
+
+def _disabled_pipes(keep):
+    # Shared embedding components (tok2vec, transformer) stay on only while a kept component
+    # listens to them; en_core_web_sm's ner embeds with its own internal tok2vec
+    nlp = get_nlp()
+    keep = set(keep)
+    for name, pipe in nlp.pipeline:
+        if keep & set(getattr(pipe, "listening_components", ())):
+            keep.add(name)
+    return [name for name in nlp.pipe_names if name not in keep]
+
+def _entities_from_doc(doc):
+    seen = set()
+    unique_entities = []
+    for ent in doc.ents:
+        entity = (ent.text, ent.label_)
+        if entity not in seen:
+            seen.add(entity)
+            unique_entities.append(entity)
+    return unique_entities
+
+def _relationships_from_doc(doc):
+    seen = set()
+    unique_relations = []
+    for token in doc:
+        if token.dep_ in ("attr", "dobj"):
+            subject = doc[token.head.left_edge.i : token.head.right_edge.i].text
+            object = doc[token.i : token.right_edge.i].text
+            relation = (subject, token.head.text, object)
+            if relation not in seen:
+                seen.add(relation)
+                unique_relations.append(relation)
+    return unique_relations
 
 class KnowledgeGraphBuilder:
     def __init__(self):
         self.entities = defaultdict(list)
+        # Hashed lookups so deduplication stays O(1) per extracted item
+        self.node_index = {}  # (name, label) -> node
+        self.relationship_index = {}  # (source, type, target) -> relationship
+        self.node_counts = defaultdict(int)  # Number of contributions keeping each node alive
+        # Per-document contributions so a changed or deleted file can be retracted
+        self.provenance = {}  # path -> {"hash", "nodes", "relationships"}
         
     def extract_entities(self, text):
-        doc = nlp(text)
-        seen = set()
-        unique_entities = []
-        for ent in doc.ents:
-            entity = (ent.text, ent.label_)
-            if entity not in seen:
-                seen.add(entity)
-                unique_entities.append(entity)
-        return unique_entities
+        return _entities_from_doc(get_nlp()(text, disable=_disabled_pipes(ENTITY_PIPES)))
     
     def extract_relationships(self, text):
-        doc = nlp(text)
-        seen = set()
-        unique_relations = []
-        for token in doc:
-            if token.dep_ in ("attr", "dobj"):
-                subject = doc[token.head.left_edge.i : token.head.right_edge.i].text
-                object = doc[token.i : token.right_edge.i].text
-                relation = (subject, token.head.text, object)
-                if relation not in seen:
-                    seen.add(relation)
-                    unique_relations.append(relation)
-        return unique_relations
+        return _relationships_from_doc(get_nlp()(text, disable=_disabled_pipes(RELATIONSHIP_PIPES)))
+    
+    def extract_batch(self, texts, batch_size=64, n_process=1, relationships=True):
+        # Parses every text once with nlp.pipe and yields (entities, relationships) in input
+        # order. Without relationships the dependency parser is skipped entirely.
+        keep = ENTITY_PIPES | RELATIONSHIP_PIPES if relationships else ENTITY_PIPES
+        docs = get_nlp().pipe(texts, batch_size=batch_size, n_process=n_process, disable=_disabled_pipes(keep))
+        for doc in docs:
+            yield _entities_from_doc(doc), _relationships_from_doc(doc) if relationships else []
     
     def create_nodes(self, entities):
         for entity, label in entities:
             # Instead of creating nodes in Neo4j, we'll collect them for CSV export
-            self.entities["nodes"].append({"name": entity, "label": label})
+            key = (entity, label)
+            self.node_counts[key] += 1
+            if key in self.node_index:
+                continue
+            node = {"name": entity, "label": label}
+            self.node_index[key] = node
+            self.entities["nodes"].append(node)
     
     def create_relationships(self, relationships):
         for subject, predicate, obj in relationships:
             # Instead of creating relationships in Neo4j, we'll collect them for CSV export
-            self.entities["relationships"].append({
+            key = (subject, predicate, obj)
+            existing = self.relationship_index.get(key)
+            if existing is not None:
+                existing["weight"] += 1  # Seen again in another document
+                continue
+            relationship = {
                 "source": subject,
                 "target": obj,
                 "type": predicate,
                 "weight": 1  # Default weight
-            })
+            }
+            self.relationship_index[key] = relationship
+            self.entities["relationships"].append(relationship)
+    
+    def has_document(self, path, content_hash):
+        return self.provenance.get(path, {}).get("hash") == content_hash
+    
+    def add_document(self, path, content_hash, entities, relationships):
+        if path in self.provenance:
+            self.remove_documents([path])
+        self.create_nodes(entities)
+        self.create_relationships(relationships)
+        self.provenance[path] = {
+            "hash": content_hash,
+            "nodes": list(entities),
+            "relationships": list(relationships)
+        }
+    
+    def remove_documents(self, paths):
+        removed = False
+        for path in paths:
+            contribution = self.provenance.pop(path, None)
+            if contribution is None:
+                continue
+            removed = True
+            for key in contribution["nodes"]:
+                self.node_counts[key] -= 1
+                if self.node_counts[key] <= 0:
+                    del self.node_counts[key]
+                    self.node_index.pop(key, None)
+            for key in contribution["relationships"]:
+                relationship = self.relationship_index.get(key)
+                if relationship is None:
+                    continue
+                relationship["weight"] -= 1
+                if relationship["weight"] <= 0:
+                    del self.relationship_index[key]
+        if removed:
+            # Rebuilt once per batch, the indexes keep insertion order
+            self.entities["nodes"] = list(self.node_index.values())
+            self.entities["relationships"] = list(self.relationship_index.values())
+        return removed
+    
+    def save_state(self, file_path):
+        os.makedirs(os.path.dirname(file_path) or '.', exist_ok=True)
+        tmp_path = file_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump({
+                "node_index": self.node_index,
+                "relationship_index": self.relationship_index,
+                "node_counts": dict(self.node_counts),
+                "provenance": self.provenance
+            }, f)
+        os.replace(tmp_path, file_path)
+    
+    @classmethod
+    def load_state(cls, file_path):
+        builder = cls()
+        with open(file_path, 'rb') as f:
+            state = pickle.load(f)
+        builder.node_index = state["node_index"]
+        builder.relationship_index = state["relationship_index"]
+        builder.node_counts.update(state["node_counts"])
+        builder.provenance = state["provenance"]
+        builder.entities["nodes"] = list(builder.node_index.values())
+        builder.entities["relationships"] = list(builder.relationship_index.values())
+        return builder
     
     def build_graph(self, documents):
         for doc in documents:
@@ -57,7 +172,7 @@ class KnowledgeGraphBuilder:
             self.create_nodes(entities)
             self.create_relationships(relationships)
     
-    def export_to_csv(self, directory="graph_visualization_files"):
+    def export_to_csv(self, directory=os.path.join("data", "graph_visualization_files")):
         # Ensure the directory exists
         os.makedirs(directory, exist_ok=True)
     
@@ -77,4 +192,104 @@ class KnowledgeGraphBuilder:
             for rel in self.entities.get("relationships", []):
                 writer.writerow(rel)
     
-        print(f"Graph data exported to {directory}")
\ No newline at end of file
+        print(f"Graph data exported to {directory}")
+
+class GraphIndex:
+    # In-process lookup over the builder output, used to send only the part of the graph a
+    # query is about. Names are matched case-insensitively and numbered; edges are held as
+    # CSR arrays, so the edges of node i are targets[offsets[i]:offsets[i + 1]] with
+    # matching weights and relationship rows, and a BFS hop gathers a whole frontier at once.
+    def __init__(self, nodes, relationships, max_name_words=6):
+        self.nodes = defaultdict(list)
+        for node in nodes:
+            self.nodes[node["name"].lower()].append(node)
+        self.relationships = list(relationships)
+        self.ids = {name: i for i, name in enumerate(self.nodes)}
+        for rel in self.relationships:
+            for name in (rel["source"].lower(), rel["target"].lower()):
+                self.ids.setdefault(name, len(self.ids))
+        self.names = list(self.ids)
+        self.max_name_words = max_name_words
+
+        sources = np.array([self.ids[rel["source"].lower()] for rel in self.relationships], dtype='int64')
+        targets = np.array([self.ids[rel["target"].lower()] for rel in self.relationships], dtype='int64')
+        rel_ids = np.arange(len(self.relationships), dtype='int64')
+        self.weights = np.array([float(rel["weight"]) for rel in self.relationships], dtype='float64')
+        self.out_edges = self._csr(sources, targets, rel_ids)
+        # Context expansion and shortest paths ignore direction; a self-loop is listed once
+        loops = sources == targets
+        self.all_edges = self._csr(
+            np.concatenate([sources, targets[~loops]]),
+            np.concatenate([targets, sources[~loops]]),
+            np.concatenate([rel_ids, rel_ids[~loops]])
+        )
+
+    def _csr(self, sources, targets, rel_ids):
+        # Each node's edges in relationship order
+        order = np.lexsort((rel_ids, sources))
+        offsets = np.zeros(len(self.names) + 1, dtype='int64')
+        np.cumsum(np.bincount(sources, minlength=len(self.names)), out=offsets[1:])
+        return offsets, targets[order], rel_ids[order]
+
+    @staticmethod
+    def _expand(edges, frontier):
+        # Positions of every edge leaving the frontier nodes, node by node
+        offsets = edges[0]
+        starts, counts = offsets[frontier], offsets[frontier + 1] - offsets[frontier]
+        firsts = np.repeat(starts - np.cumsum(counts) + counts, counts)
+        return np.repeat(frontier, counts), firsts + np.arange(counts.sum())
+
+    @staticmethod
+    def _first_seen(values):
+        # Distinct values in order of first occurrence
+        _, first = np.unique(values, return_index=True)
+        return values[np.sort(first)]
+
+    def find_entities(self, query):
+        names = []
+        for entity, _ in _entities_from_doc(get_nlp()(query, disable=_disabled_pipes(ENTITY_PIPES))):
+            if entity.lower() in self.ids:
+                names.append(entity.lower())
+        # Word n-grams catch names NER misses, such as tickers or lowercased queries
+        words = [word.strip("?!,;:'\"()") for word in query.lower().split()]
+        for size in range(min(self.max_name_words, len(words)), 0, -1):
+            for i in range(len(words) - size + 1):
+                name = " ".join(words[i:i + size])
+                if name in self.ids:
+                    names.append(name)
+        return list(dict.fromkeys(names))
+    
+    def neighborhood(self, query, hops=2, limit=50):
+        # Breadth-first expansion from the query's entities; edges are ranked by weight,
+        # with edges closer to the query entities first among equal weights
+        seeds = self.find_entities(query)
+        _, targets, rel_ids = self.all_edges
+        visited = np.zeros(len(self.names), dtype=bool)
+        frontier = np.array([self.ids[name] for name in seeds], dtype='int64')
+        visited[frontier] = True
+        found_hop = np.zeros(len(self.relationships), dtype='int64')
+        found = []
+        for hop in range(1, hops + 1):
+            if not len(frontier):
+                break
+            _, positions = self._expand(self.all_edges, frontier)
+            rels = self._first_seen(rel_ids[positions])
+            rels = rels[found_hop[rels] == 0]
+            found_hop[rels] = hop
+            found.append(rels)
+            neighbors = self._first_seen(targets[positions])
+            frontier = neighbors[~visited[neighbors]]
+            visited[frontier] = True
+            if sum(len(rels) for rels in found) >= limit * 10:
+                break  # Hub entities, enough candidates to rank
+        found = np.concatenate(found) if found else np.zeros(0, dtype='int64')
+        ranked = found[np.lexsort((found_hop[found], -self.weights[found]))][:limit]
+        entities = [node for name in seeds for node in self.nodes.get(name, [])]
+        return entities, [self.relationships[i] for i in ranked]
+    
+    def context(self, query, hops=2, limit=50):
+        entities, relationships = self.neighborhood(query, hops, limit)
+        context = [f"Entity: {entity['name']}, Label: {entity['label']}" for entity in entities]
+        for rel in relationships:
+            context.append(f"Relationship: {rel['source']} -[{rel['type']}- {rel['weight']}-] -> {rel['target']}")
+        return "\n".join(context)
@@ -0,0 +1,146 @@
+import os
+import re
+import pickle
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+import numpy as np
+
+# ISO 4217 codes (plus gold and silver) that can form a pair, so words like "MARKET" aren't read as pairs
+CURRENCIES = {
+    'USD', 'EUR', 'JPY', 'GBP', 'AUD', 'NZD', 'CAD', 'CHF', 'CNY', 'CNH', 'HKD', 'SGD', 'SEK', 'NOK',
+    'DKK', 'MXN', 'ZAR', 'TRY', 'INR', 'KRW', 'BRL', 'RUB', 'PLN', 'HUF', 'CZK', 'ILS', 'THB', 'IDR',
+    'MYR', 'PHP', 'TWD', 'SAR', 'AED', 'KES', 'NGN', 'EGP', 'XAU', 'XAG'
+}
+# Pair codes as written in news and queries ("EUR/USD", "EURUSD") and broker symbols ("USDJPYc")
+_PAIR_RE = re.compile(r'\b([A-Z]{3})/?([A-Z]{3})[cC]?\b')
+_WINDOW_RE = re.compile(r'\b(?:last|past)\s+(?:(\d+)\s*)?(h|hrs?|hours?|d|days?|w|weeks?)\b', re.IGNORECASE)
+_WINDOW_UNITS = {'h': timedelta(hours=1), 'd': timedelta(days=1), 'w': timedelta(weeks=1)}
+_TYPE_WORDS = {
+    'news': re.compile(r'\b(?:news|headlines?|articles?)\b', re.IGNORECASE),
+    'strategy': re.compile(r'\b(?:strateg(?:y|ies)|setups?|signals?|trades?)\b', re.IGNORECASE),
+}
+
+def normalize_pair(symbol):
+    match = _PAIR_RE.fullmatch(symbol.strip())
+    return f"{match.group(1)}{match.group(2)}" if match else symbol.strip().upper()
+
+def find_pairs(text):
+    return sorted({
+        f"{base}{quote}" for base, quote in _PAIR_RE.findall(text.upper())
+        if base != quote and base in CURRENCIES and quote in CURRENCIES
+    })
+
+def parse_timestamp(value):
+    # publishedAt ISO strings from NewsAPI and the strategy files' %Y%m%d_%H%M%S[_%f] stamps
+    for parse in (
+        lambda v: datetime.fromisoformat(v.replace('Z', '+00:00')),
+        lambda v: datetime.strptime(v, '%Y%m%d_%H%M%S_%f'),
+        lambda v: datetime.strptime(v, '%Y%m%d_%H%M%S'),
+    ):
+        try:
+            parsed = parse(value.strip())
+        except (ValueError, AttributeError):
+            continue
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        return parsed.timestamp()
+    return None
+
+def parse_query_filters(query, now=None):
+    # Filters implied by a query such as "EURUSD news last 24h"; empty when there are none
+    now = now or datetime.now(timezone.utc)
+    filters = {}
+    pairs = find_pairs(query)
+    if pairs:
+        filters['pairs'] = pairs
+    window = _WINDOW_RE.search(query)
+    if window:
+        filters['since'] = (now - int(window.group(1) or 1) * _WINDOW_UNITS[window.group(2)[0].lower()]).timestamp()
+    elif re.search(r'\btoday\b', query, re.IGNORECASE):
+        filters['since'] = now.replace(hour=0, minute=0, second=0, microsecond=0).timestamp()
+    types = [doc_type for doc_type, pattern in _TYPE_WORDS.items() if pattern.search(query)]
+    if len(types) == 1:
+        filters['doc_type'] = types[0]
+    return filters
+
+class MetadataIndex:
+    # Attribute index over passage ids: pair -> ids, document type -> ids and publish times.
+    # The time-sorted arrays used for range filters are rebuilt lazily after changes.
+    def __init__(self):
+        self.pairs = defaultdict(set)
+        self.types = defaultdict(set)
+        self.times = {}
+        self.metadata = {}
+        self._sorted = None
+
+    def __len__(self):
+        return len(self.metadata)
+
+    def add(self, doc_id, meta):
+        self.remove(doc_id)
+        meta = meta or {}
+        self.metadata[doc_id] = meta
+        for pair in meta.get('pairs', []):
+            self.pairs[pair].add(doc_id)
+        self.types[meta.get('type', 'other')].add(doc_id)
+        if meta.get('published_at') is not None:
+            self.times[doc_id] = meta['published_at']
+        self._sorted = None
+
+    def remove(self, doc_id):
+        meta = self.metadata.pop(doc_id, None)
+        if meta is None:
+            return
+        for pair in meta.get('pairs', []):
+            self.pairs[pair].discard(doc_id)
+        self.types[meta.get('type', 'other')].discard(doc_id)
+        self.times.pop(doc_id, None)
+        self._sorted = None
+
+    def remap(self, mapping):
+        metadata = self.metadata
+        self.__init__()
+        for doc_id, meta in metadata.items():
+            if doc_id in mapping:
+                self.add(mapping[doc_id], meta)
+
+    def _time_arrays(self):
+        if self._sorted is None:
+            ids = np.fromiter(self.times.keys(), dtype='int64', count=len(self.times))
+            values = np.fromiter(self.times.values(), dtype='float64', count=len(self.times))
+            order = np.argsort(values, kind='stable')
+            self._sorted = (values[order], ids[order])
+        return self._sorted
+
+    def select(self, pairs=None, doc_type=None, since=None, until=None):
+        # Sorted array of passage ids matching every given filter, or None without filters
+        selected = None
+        if pairs:
+            selected = set().union(*(self.pairs.get(normalize_pair(pair), set()) for pair in pairs))
+        if doc_type:
+            matching = self.types.get(doc_type, set())
+            selected = matching if selected is None else selected & matching
+        if since is not None or until is not None:
+            values, ids = self._time_arrays()
+            lo = np.searchsorted(values, since, side='left') if since is not None else 0
+            hi = np.searchsorted(values, until, side='right') if until is not None else len(values)
+            in_range = set(ids[lo:hi].tolist())
+            selected = in_range if selected is None else selected & in_range
+        if selected is None:
+            return None
+        return np.array(sorted(selected), dtype='int64')
+
+    def save(self, file_path):
+        os.makedirs(os.path.dirname(file_path) or '.', exist_ok=True)
+        tmp_path = file_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(self.metadata, f)
+        os.replace(tmp_path, file_path)
+
+    @classmethod
+    def load(cls, file_path):
+        index = cls()
+        with open(file_path, 'rb') as f:
+            for doc_id, meta in pickle.load(f).items():
+                index.add(doc_id, meta)
+        return index
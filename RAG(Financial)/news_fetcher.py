@@ -1,108 +1,225 @@
 import os
-import requests
+import re
 import json
+import math
+import time
+import threading
+import requests
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
-import re
+from http_client import get_transport
+from metadata_index import CURRENCIES
+from news_store import NewsStore
 
 API_KEY = os.getenv("NEWS_API_KEY")
+# Overridable so the fetcher can be pointed at a local stub of the endpoint
+NEWS_API_URL = os.getenv("NEWS_API_URL", "https://newsapi.org/v2/everything")
+QUERY_TERMS = 'forex OR "foreign exchange" OR "currency trading"'
+PAGE_SIZE = 100  # The most NewsAPI returns per page
+# Results NewsAPI serves per query; the developer plan stops at 100, paid plans allow more
+# and the pages past the first are then requested concurrently
+MAX_RESULTS = int(os.getenv("NEWS_API_MAX_RESULTS", "100"))
+MAX_CONCURRENT_PAGES = 4
+# Queries whose results run past MAX_RESULTS are repeated with `to` moved back to the oldest
+# article fetched, this many times at most per fetch
+MAX_WINDOWS = 20
+REQUESTS_PER_SECOND = 2.0
+LOOKBACK = timedelta(days=2)
+# Articles can be indexed by NewsAPI a while after their publishedAt, so each fetch reaches
+# back this far past the watermark; the store drops the ones it already holds
+WATERMARK_OVERLAP = timedelta(minutes=15)
+WATERMARK_FILE = 'fetch_watermark.json'
+
+_SLASH_PAIR_RE = re.compile(r'\b([A-Z]{3})/([A-Z]{3})\b')
+_JOINED_PAIR_RE = re.compile(r'\b([A-Z]{3})([A-Z]{3})\b')
 
 def extract_currency_pairs(text):
-    patterns = [
-        r'\b[A-Z]{3}/[A-Z]{3}\b',  
-        r'\b([A-Z]{3})([A-Z]{3})\b'  
-    ]
-    pairs = []
-    for pattern in patterns:
-        matches = re.findall(pattern, text)
-        for match in matches:
-            if isinstance(match, tuple):
-                pairs.append(f"{match[0]}/{match[1]}")
-            else:
-                pairs.append(match)
-    return list(set(pairs))  # Remove duplicates
-
-def fetch_forex_news(news_dir):
-    API_KEY = os.getenv("NEWS_API_KEY")
-    if not API_KEY:
+    # "EUR/USD" and "EURUSD" forms, kept only when both codes are known currencies
+    pairs = set()
+    for pattern in (_SLASH_PAIR_RE, _JOINED_PAIR_RE):
+        for base, quote in pattern.findall(text or ''):
+            if base != quote and base in CURRENCIES and quote in CURRENCIES:
+                pairs.add(f"{base}/{quote}")
+    return sorted(pairs)
+
+class RateLimiter:
+    # Spaces request starts at least 1/rate seconds apart across threads
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0.0
+        self.next_start = 0.0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            start = max(now, self.next_start)
+            self.next_start = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+def _parse_published(value):
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).astimezone(timezone.utc)
+    except (ValueError, AttributeError):
+        return None
+
+def load_watermark(news_store):
+    path = os.path.join(news_store.directory, WATERMARK_FILE)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r') as f:
+            return _parse_published(json.load(f).get('publishedAt'))
+    except (ValueError, OSError):
+        return None
+
+def save_watermark(news_store, published_at):
+    path = os.path.join(news_store.directory, WATERMARK_FILE)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump({'publishedAt': published_at.isoformat(timespec='seconds')}, f, indent=4)
+    os.replace(tmp_path, path)
+
+# Returned by _fetch_page for pages beyond what the plan serves
+RESULTS_LIMIT = 'maximumResultsReached'
+
+def _fetch_page(transport, limiter, base_url, api_key, params, page):
+    # (articles, totalResults) of one page, RESULTS_LIMIT past the plan's last page, or None
+    # after printing why it failed
+    limiter.wait()
+    try:
+        # The key goes in a header so it stays out of logged URLs
+        response = transport.get(base_url, params=dict(params, page=page),
+                                 headers={'X-Api-Key': api_key}, timeout=30)
+    except requests.RequestException as e:
+        print(f"NewsAPI request for page {page} failed: {e}")
+        return None
+    try:
+        data = response.json()
+    except ValueError:
+        data = {}
+    if response.status_code != 200 or data.get('status') != 'ok':
+        if data.get('code') == 'maximumResultsReached':
+            return RESULTS_LIMIT
+        print(f"NewsAPI request for page {page} failed with status {response.status_code}: "
+              f"{data.get('message') or response.text}")
+        return None
+    return data.get('articles') or [], data.get('totalResults') or 0
+
+def _fetch_window(transport, limiter, base_url, api_key, params, max_results):
+    # Articles of one query, newest first: the first page gives the total, the pages up to
+    # max_results are requested concurrently under the shared rate limit. Returns
+    # (articles, total, ok, max_results) where max_results shrinks to what the plan served
+    # when it refuses deeper pages; ok is False when a page failed.
+    first = _fetch_page(transport, limiter, base_url, api_key, params, 1)
+    if first is None:
+        return [], 0, False, max_results
+    if first == RESULTS_LIMIT:
+        print("NewsAPI served no results for the query.")
+        return [], 0, False, max_results
+    articles, total = first
+    n_pages = min(math.ceil(total / PAGE_SIZE), max(max_results // PAGE_SIZE, 1))
+    ok = True
+    if n_pages > 1:
+        with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_PAGES) as executor:
+            pages = executor.map(
+                lambda page: _fetch_page(transport, limiter, base_url, api_key, params, page),
+                range(2, n_pages + 1)
+            )
+            for number, page in enumerate(pages, start=2):
+                if page is None:
+                    ok = False
+                elif page == RESULTS_LIMIT:
+                    max_results = min(max_results, (number - 1) * PAGE_SIZE)
+                else:
+                    articles.extend(page[0])
+    return articles, total, ok, max_results
+
+def fetch_forex_news(news_store, api_key=None, base_url=None, transport=None, max_results=None):
+    # Fetches forex articles published since the last fetch. NewsAPI serves at most
+    # max_results per query, newest first, so when more were published the query is repeated
+    # with `to` at the oldest article fetched until the whole range since the watermark is
+    # covered. The watermark only moves once it is.
+    api_key = api_key or os.getenv("NEWS_API_KEY")
+    if not api_key:
         print("NEWS_API_KEY not found. Please set it in your environment.")
         return
-    
+    base_url = base_url or NEWS_API_URL
+    transport = transport or get_transport()
+    max_results = max_results or MAX_RESULTS
+
     current_time_utc = datetime.now(timezone.utc)
-    cutoff_date_utc = current_time_utc - timedelta(days=2)
-    start_date = cutoff_date_utc.isoformat(timespec='seconds')  # Use exact cutoff time
-    end_date = current_time_utc.isoformat(timespec='seconds')
-
-    # More targeted query for forex-related news
-    query_terms = 'forex OR "foreign exchange" OR "currency trading"'
-    url = f"https://newsapi.org/v2/everything?q={query_terms}&from={start_date}&to={end_date}&sortBy=publishedAt&apiKey={API_KEY}"
-    
-    print(f"Fetching news from URL: {url}")
-    response = requests.get(url)
-    
-    # Check for HTTP errors
-    if response.status_code != 200:
-        print(f"NewsAPI request failed with status {response.status_code}: {response.text}")
-        return
-    
-    data = response.json()
-    
-    # Check API error status
-    if data.get('status') != 'ok':
-        print(f"NewsAPI error: {data.get('message', 'Unknown error')}")
-        return
-    
-    articles = data.get('articles', [])
+    cutoff_date_utc = current_time_utc - LOOKBACK
+    watermark = load_watermark(news_store)
+    if watermark is not None:
+        cutoff_date_utc = max(cutoff_date_utc, watermark - WATERMARK_OVERLAP)
+
+    # A fixed upper bound keeps articles published while paging from shifting the pages
+    params = {
+        'q': QUERY_TERMS,
+        'from': cutoff_date_utc.isoformat(timespec='seconds'),
+        'to': current_time_utc.isoformat(timespec='seconds'),
+        'sortBy': 'publishedAt',
+        'pageSize': PAGE_SIZE
+    }
+    print(f"Fetching news published since {params['from']}")
+    limiter = RateLimiter(REQUESTS_PER_SECOND)
+    articles = []
+    complete = False
+    window_end = current_time_utc
+    for _ in range(MAX_WINDOWS):
+        window, total, ok, max_results = _fetch_window(transport, limiter, base_url, api_key, params, max_results)
+        articles.extend(window)
+        if not ok:
+            break
+        if len(window) >= total:
+            complete = True
+            break
+        # `to` is inclusive, so articles at the oldest second come again and are deduplicated
+        dates = [date for date in (_parse_published(article.get('publishedAt')) for article in window) if date]
+        oldest = min(dates) if dates else None
+        if oldest is None or oldest >= window_end:
+            print(f"More than {max_results} articles share the publication time {params['to']}.")
+            break
+        window_end = oldest
+        params['to'] = window_end.isoformat(timespec='seconds')
+    if not complete:
+        print(f"Articles published between {params['from']} and {params['to']} were not all fetched; "
+              f"the watermark stays so the next fetch retries them.")
     if not articles:
         print("No articles found in the specified date range.")
         return
-    
-    saved_count = 0
 
+    records = []
+    latest = None
     for article in articles:
         try:
             published_at = article.get('publishedAt')
-            if not published_at:
-                continue  # Skip articles without publication date
-            
-            # Parse publication date correctly
-            article_date = datetime.fromisoformat(published_at.replace('Z', '+00:00')).astimezone(timezone.utc)
-            
-            # Skip articles older than the cutoff
-            if article_date < cutoff_date_utc:
-                continue
-            
-            # Generate unique filename using publication timestamp
-            timestamp = article_date.strftime('%Y%m%d_%H%M%S')
-            filename = f"forex_news_{timestamp}.json"
-            filepath = os.path.join(news_dir, filename)
-            
-            if os.path.exists(filepath):
-                continue  # Skip already saved articles
-            
+            article_date = _parse_published(published_at)
+            if article_date is None or article_date < cutoff_date_utc:
+                continue  # Skip articles without a usable publication date or outside the window
+
             # Extract content from article (fallback to description if needed)
             content = article.get('content', '') or article.get('description', '')
-            pairs = extract_currency_pairs(content)
-            
-            # Save article data
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump({
-                    'title': article.get('title', ''),
-                    'content': content,
-                    'pairs': pairs,
-                    'source': article.get('source', {}).get('name', 'Unknown'),
-                    'publishedAt': published_at,
-                    'url': article.get('url', '')
-                }, f, ensure_ascii=False)
-            
-            saved_count += 1
-            print(f"Saved: {filename}")
-            
+            records.append({
+                'title': article.get('title', ''),
+                'content': content,
+                'pairs': extract_currency_pairs(f"{article.get('title') or ''} {content}"),
+                'source': (article.get('source') or {}).get('name', 'Unknown'),
+                'publishedAt': published_at,
+                'url': article.get('url', '')
+            })
+            latest = article_date if latest is None else max(latest, article_date)
         except Exception as e:
             print(f"Error processing article: {str(e)}")
             continue
 
-    # print(f"Saved {saved_count} new news articles.")
+    # The store skips articles whose URL (or title and content) it already holds
+    saved_count = news_store.append(records)
+    print(f"Saved {saved_count} new news articles from {len(articles)} fetched.")
+    # A missing page or window would leave a gap behind the watermark
+    if complete and latest is not None:
+        save_watermark(news_store, latest)
 
 if __name__ == "__main__":
-    os.makedirs("data/forex_news", exist_ok=True)
-    fetch_forex_news("data/forex_news")
\ No newline at end of file
+    fetch_forex_news(NewsStore("data/news_store"))
@@ -0,0 +1,150 @@
+import os
+import json
+import glob
+import shutil
+import hashlib
+from datetime import datetime, timezone
+
+class NewsStore:
+    # Append-only news archive: one JSONL segment per publication day, a key file of every
+    # URL (or content hash) already stored for deduplication, and a watermark holding the
+    # byte offset ingestion has consumed in each segment. New rows since the watermark are
+    # read with a seek and one sequential read per segment.
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.keys_path = os.path.join(directory, 'keys.txt')
+        self.watermark_path = os.path.join(directory, 'watermark.json')
+        self.keys = set()
+        if os.path.exists(self.keys_path):
+            with open(self.keys_path, 'r', encoding='utf-8') as f:
+                self.keys = set(f.read().split())
+        self.watermark = {}
+        if os.path.exists(self.watermark_path):
+            with open(self.watermark_path, 'r') as f:
+                self.watermark = json.load(f)
+        self.pending = {}
+
+    @staticmethod
+    def article_key(article):
+        url = (article.get('url') or '').strip()
+        if url:
+            return hashlib.sha256(url.encode('utf-8')).hexdigest()
+        text = f"{article.get('title') or ''}\0{article.get('content') or ''}"
+        return hashlib.sha256(text.encode('utf-8', errors='ignore')).hexdigest()
+
+    def segment_path(self, published_at):
+        try:
+            day = datetime.fromisoformat(published_at.replace('Z', '+00:00')).astimezone(timezone.utc)
+            name = day.strftime('%Y%m%d')
+        except (ValueError, AttributeError):
+            name = 'undated'
+        return os.path.join(self.directory, f"news_{name}.jsonl")
+
+    def contains(self, article):
+        return self.article_key(article) in self.keys
+
+    def append(self, articles):
+        # Returns the number of articles stored; ones already in the store are skipped
+        segments = {}
+        new_keys = []
+        for article in articles:
+            key = self.article_key(article)
+            if key in self.keys:
+                continue
+            self.keys.add(key)
+            new_keys.append(key)
+            segments.setdefault(self.segment_path(article.get('publishedAt')), []).append(article)
+
+        for path, rows in segments.items():
+            with open(path, 'a', encoding='utf-8') as f:
+                for row in rows:
+                    f.write(json.dumps(row, ensure_ascii=False) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+        # Keys are written after the rows, so a crash can only leave a row without its key
+        if new_keys:
+            with open(self.keys_path, 'a', encoding='utf-8') as f:
+                f.write(''.join(key + '\n' for key in new_keys))
+        return len(new_keys)
+
+    def segments(self):
+        return sorted(glob.glob(os.path.join(self.directory, 'news_*.jsonl')))
+
+    def has_new(self):
+        return any(os.path.getsize(path) > self.watermark.get(os.path.basename(path), 0) for path in self.segments())
+
+    def read_new(self):
+        # Yields (segment path, byte offset, article) for rows past the watermark. The
+        # offsets read are only recorded once commit() is called, after they were ingested.
+        for path in self.segments():
+            name = os.path.basename(path)
+            offset = self.watermark.get(name, 0)
+            if os.path.getsize(path) <= offset:
+                continue
+            with open(path, 'rb') as f:
+                f.seek(offset)
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        break  # A row still being written, picked up next time
+                    try:
+                        article = json.loads(line)
+                    except ValueError:
+                        article = None
+                    if article is not None:
+                        yield path, offset, article
+                    offset += len(line)
+                    self.pending[name] = offset
+
+    def commit(self):
+        self.watermark.update(self.pending)
+        self.pending = {}
+        tmp_path = self.watermark_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.watermark, f, indent=4)
+        os.replace(tmp_path, self.watermark_path)
+
+    def _stored_keys(self):
+        # Keys of the rows that read back from the segments on disk
+        keys = set()
+        for path in self.segments():
+            with open(path, 'rb') as f:
+                for line in f:
+                    try:
+                        keys.add(self.article_key(json.loads(line)))
+                    except (ValueError, AttributeError):
+                        continue
+        return keys
+
+    def migrate(self, legacy_dir, pattern='forex_news_*.json'):
+        # Copies the per-article JSON files older versions wrote into the store, then moves
+        # them into the store's legacy/ directory once every article reads back from the
+        # fsynced segments. Nothing is deleted; empty or malformed files are moved as well.
+        paths = sorted(glob.glob(os.path.join(legacy_dir, pattern)))
+        if not paths:
+            return 0
+        articles, migrated = [], []
+        for path in paths:
+            try:
+                with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+                    article = json.load(f)
+            except ValueError:
+                article = None
+            except OSError as e:
+                print(f"Skipping {path}: {e}")
+                continue
+            if isinstance(article, dict):
+                articles.append(article)
+            migrated.append(path)
+        added = self.append(articles)
+        missing = {self.article_key(article) for article in articles} - self._stored_keys()
+        if missing:
+            print(f"Not archiving the news files in {legacy_dir}: {len(missing)} articles did not read back from {self.directory}.")
+            return added
+        archive_dir = os.path.join(self.directory, 'legacy')
+        os.makedirs(archive_dir, exist_ok=True)
+        for path in migrated:
+            shutil.move(path, os.path.join(archive_dir, os.path.basename(path)))
+        print(f"Migrated {len(migrated)} news files into {self.directory} ({added} new articles), "
+              f"originals moved to {archive_dir}.")
+        return added
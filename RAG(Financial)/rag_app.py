@@ -1,32 +1,59 @@
 import os
-import shutil
-import faiss
-from graph_query import GraphQuery
-import numpy as np
-from datetime import datetime
-from sentence_transformers import SentenceTransformer
-from knowledge_graph import KnowledgeGraphBuilder
-from gemini_api import GeminiClient
+import itertools
+from encoder import get_encoder
+from knowledge_graph import KnowledgeGraphBuilder, GraphIndex
+from gemini_api import GeminiClient, AnswerError
+from retriever import Retriever
 import news_fetcher
+from news_store import NewsStore
 import data_loader
 import importlib.util
 import sys
-from cachetools import LRUCache  # Install with pip install cachetools
-from concurrent.futures import ProcessPoolExecutor
+from answer_cache import AnswerCache
+from metadata_index import parse_query_filters
 
 STRAT_DIR = 'strategies' 
 DATA_DIR = 'data'
 INDEXES_DIR = os.path.join(DATA_DIR, 'indexes')
-NEWS_DIR = os.path.join(DATA_DIR, 'forex_news')
+NEWS_DIR = os.path.join(DATA_DIR, 'forex_news')  # Per-article JSON files of older versions
+NEWS_STORE_DIR = os.path.join(DATA_DIR, 'news_store')
 STRATEGY_DIR = os.path.join(DATA_DIR, 'strategies')
-DOC_PATH = os.path.join(INDEXES_DIR, 'docs.pkl')
+DOC_PATH = os.path.join(INDEXES_DIR, 'docs')  # docs.bin + docs.offsets.npy, migrated from docs.pkl
 FAISS_INDEX_PATH = os.path.join(INDEXES_DIR, 'index.idx')
+EMBEDDINGS_PATH = os.path.join(INDEXES_DIR, 'embeddings.pkl')
+SPARSE_INDEX_PATH = os.path.join(INDEXES_DIR, 'bm25.pkl')
+METADATA_PATH = os.path.join(INDEXES_DIR, 'metadata.pkl')
+GRAPH_STATE_PATH = os.path.join(INDEXES_DIR, 'graph_state.pkl')
+ANSWER_CACHE_PATH = os.path.join(INDEXES_DIR, 'answer_cache.sqlite')
+EMBEDDING_CACHE_PATH = os.path.join(INDEXES_DIR, 'embedding_cache.sqlite')
 
 TRACKER_FILE = os.path.join(INDEXES_DIR, 'file_tracker.json')
 
+# Exact search until the corpus outgrows it; FAISS_INDEX_TYPE=flat|ivf|hnsw forces a type and
+# FAISS_COMPRESSION=sq8|pq compresses the vectors of the approximate indexes
+FAISS_INDEX_TYPE = os.getenv("FAISS_INDEX_TYPE") or None
+FAISS_COMPRESSION = os.getenv("FAISS_COMPRESSION") or None
+
+# One embedding model for indexing and queries; EMBEDDING_PRECISION=float16|int8 shrinks it
+EMBEDDING_MODEL = 'all-MiniLM-L6-v2'
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+EMBEDDING_PRECISION = os.getenv("EMBEDDING_PRECISION", "float32")
+
+# Parsed documents are embedded this many at a time on their way to the knowledge graph
+INGEST_BATCH_SIZE = 64
+
+# By default the RAG and graph answers are generated concurrently and the more detailed one
+# is shown. STREAM_ANSWERS=1 prints the RAG answer as it is generated instead (the graph one
+# only when that fails), trading the comparison for time to first token.
+STREAM_ANSWERS = os.getenv("STREAM_ANSWERS", "0") == "1"
+
 def load_new_strategies():
     if not os.path.exists(STRAT_DIR):
         return
+    # The strategy modules import the shared scanner next to them
+    strat_path = os.path.abspath(STRAT_DIR)
+    if strat_path not in sys.path:
+        sys.path.append(strat_path)
     for fname in os.listdir(STRAT_DIR):
         if fname.endswith('.py') and any(fname.startswith(s) for s in ('bounce', 'daily', 'trend')):
             path = os.path.join(STRAT_DIR, fname)
@@ -35,10 +62,114 @@ def load_new_strategies():
             sys.modules[fname] = module
             spec.loader.exec_module(module)
 
+def print_stream(chunks):
+    print("--- ANALYSIS ---\n")
+    parts = []
+    failed = False
+    for chunk in chunks:
+        print(chunk, end='', flush=True)
+        parts.append(chunk)
+        failed = failed or isinstance(chunk, AnswerError)
+    print("\n\n----------------\n")
+    answer = ''.join(parts)
+    return AnswerError(answer) if failed or not answer else answer
+
+def answer_cache_version(retriever):
+    graph_version = os.stat(GRAPH_STATE_PATH).st_mtime_ns if os.path.exists(GRAPH_STATE_PATH) else 0
+    return f"{retriever.version}:{graph_version}"
+
+def update_indexes(new_files, deleted_files, encoder, news_store):
+    # Changed files are parsed on a process pool and streamed through the indexer in batches
+    # and on into the knowledge graph, so only a few batches of parsed documents are in memory
+    print("Updating FAISS index...")
+    indexer = None
+    removed = list(deleted_files)
+    try:
+        indexer = data_loader.IncrementalIndexer(FAISS_INDEX_PATH, DOC_PATH, EMBEDDINGS_PATH,
+                                                 sparse_path=SPARSE_INDEX_PATH, metadata_path=METADATA_PATH,
+                                                 index_type=FAISS_INDEX_TYPE, compression=FAISS_COMPRESSION,
+                                                 encoder=encoder)
+        # Paths missing on disk also catch files deleted before the tracker reported deletions
+        removed = sorted(set(removed).union(
+            path for path in indexer.paths()
+            if path != 'unknown' and not os.path.exists(data_loader.source_path(path))
+        ))
+        indexer.remove(removed)
+    except Exception as e:
+        print(f"Failed to update FAISS index: {e}")
+        indexer = None
+
+    # New news store rows since the watermark follow the changed files
+    documents = itertools.chain(
+        data_loader.iter_documents(new_files),
+        data_loader.news_documents(news_store.read_new())
+    )
+    if indexer is not None:
+        documents = indexer.add_stream(documents, INGEST_BATCH_SIZE)
+
+    # Build knowledge graph and get entities and relationships
+    graph_files_dir = os.path.join(DATA_DIR, 'graph_visualization_files')
+    seed_graph = indexer is not None and not os.path.exists(GRAPH_STATE_PATH)
+    if seed_graph:
+        # Without a saved graph the whole corpus is extracted once indexing is done
+        for _ in documents:
+            pass
+    else:
+        # Only the files that changed since the last run are extracted
+        print("Extracting entities and relationships...")
+        entities, relationships = data_loader.build_knowledge_graph(
+            documents,
+            export_to_csv=True,
+            csv_dir=graph_files_dir,
+            state_path=GRAPH_STATE_PATH,
+            removed_paths=removed
+        )
+
+    indexed = 0
+    if indexer is not None:
+        try:
+            if indexer.error is not None:
+                raise indexer.error
+            indexed = indexer.store.size()
+            if indexed:
+                indexer.commit()
+        except Exception as e:
+            print(f"Failed to update FAISS index: {e}")
+            indexer, indexed = None, 0
+
+    if seed_graph:
+        print("Extracting entities and relationships...")
+        if indexer is not None:
+            # Read back passage by passage from the committed document store
+            graph_docs = data_loader.documents_from_passages(indexer.documents())
+        else:
+            # Indexing failed, parse them again
+            graph_docs = itertools.chain(
+                data_loader.iter_documents(new_files),
+                data_loader.news_documents(news_store.read_new())
+            )
+        entities, relationships = data_loader.build_knowledge_graph(
+            graph_docs,
+            export_to_csv=True,
+            csv_dir=graph_files_dir,
+            state_path=GRAPH_STATE_PATH,
+            removed_paths=removed
+        )
+
+    if indexer is not None:
+        # Rows are only marked as ingested once they are in the index
+        news_store.commit()
+
+    if not indexed and not entities:
+        print("No documents found for indexing. Exiting.")
+        return None
+
+    print(f"Entities and relationships saved to {graph_files_dir}")
+    return entities, relationships
+
 def main():
     # Ensure necessary directories exist
     os.makedirs(DATA_DIR, exist_ok=True)
-    os.makedirs(NEWS_DIR, exist_ok=True)
     os.makedirs(STRATEGY_DIR, exist_ok=True)
     os.makedirs(INDEXES_DIR, exist_ok=True)
 
@@ -48,117 +179,128 @@ def main():
         return
 
     # Fetch new forex news and run strategies
-    news_fetcher.fetch_forex_news(NEWS_DIR)
+    news_store = NewsStore(NEWS_STORE_DIR)
+    if os.path.isdir(NEWS_DIR):
+        # Archived files show up as deleted below and their rows are indexed from the store
+        news_store.migrate(NEWS_DIR)
+    news_fetcher.fetch_forex_news(news_store)
     load_new_strategies()
 
     # Index all documents
-    new_files = data_loader.track_file_changes(DATA_DIR, TRACKER_FILE)
-    new_docs = []
-    for file_path in new_files:
-        content = data_loader._read_any_file(file_path)
-        if content:
-            new_docs.append({
-                'path': file_path,
-                'content': content
-            })
-    
-    old_docs = []
-    if os.path.exists(DOC_PATH):
-        old_docs = data_loader.load_documents(DOC_PATH)
-    
-     # Ensure old_docs are in the correct format
-    if old_docs and isinstance(old_docs[0], str):
-        # Convert old_docs from list of strings to list of dictionaries
-        old_docs = [{'content': doc, 'path': 'unknown'} for doc in old_docs]
-    
-    docs = new_docs + old_docs
-
-    if not docs:
-        print("No documents found for indexing. Exiting.")
-        return
-    
-    # Refresh the index
-    print("Building FAISS index...")
-    try:
-        index = data_loader.build_faiss_index(docs)
-        faiss.write_index(index, FAISS_INDEX_PATH)
-        data_loader.save_documents(docs, DOC_PATH)
-    except Exception as e:
-        print(f"Failed to build FAISS index: {e}")
-        
-    # Build knowledge graph and get entities and relationships
-    print("Extracting entities and relationships...")
-    graph_files_dir = os.path.join(DATA_DIR, 'graph_visualization_files')
-    entities, relationships = data_loader.build_knowledge_graph(docs, export_to_csv=True, csv_dir=graph_files_dir)
+    new_files, deleted_files = data_loader.track_file_changes(DATA_DIR, TRACKER_FILE)
+    encoder = get_encoder(EMBEDDING_MODEL, batch_size=EMBEDDING_BATCH_SIZE, precision=EMBEDDING_PRECISION,
+                          cache_path=EMBEDDING_CACHE_PATH)
 
-    print(f"Entities and relationships saved to {graph_files_dir}")
+    unchanged = not new_files and not deleted_files and not news_store.has_new()
+    if unchanged and os.path.exists(FAISS_INDEX_PATH) and os.path.exists(GRAPH_STATE_PATH):
+        # Nothing changed since the last run: skip the indexer and graph extraction, and with
+        # them the embedding and spaCy models, until a query needs them
+        print("No new or deleted files, using the existing indexes.")
+        graph_builder = KnowledgeGraphBuilder.load_state(GRAPH_STATE_PATH)
+        entities = graph_builder.entities.get("nodes", [])
+        relationships = graph_builder.entities.get("relationships", [])
+    else:
+        updated = update_indexes(new_files, deleted_files, encoder, news_store)
+        if updated is None:
+            return
+        entities, relationships = updated
 
     # Initialize components
     gemini = GeminiClient()
-    embedder = SentenceTransformer('all-MiniLM-L6-v2')
+    retriever = Retriever(FAISS_INDEX_PATH, DOC_PATH, sparse_path=SPARSE_INDEX_PATH, metadata_path=METADATA_PATH)
+    graph_index = GraphIndex(entities, relationships)
 
     # Interactive loop
     print("\n--- Forex Analysis System ---")
     print("Type 'exit' to quit at any time.")
     print("-----------------------------\n")
 
-    cache = LRUCache(maxsize=100)
+    cache = AnswerCache(ANSWER_CACHE_PATH)
 
     while True:
-        query = input("Enter your query: ").strip().lower()
+        raw_query = input("Enter your query: ").strip()
+        query = raw_query.lower()
         if query == 'exit':
             break
 
-        # Check cache
-        if query in cache:
-            print(f"--- ANALYSIS ---\n\n{cache[query]}\n\n----------------\n")
+        query_embedding = encoder.encode_query(query)
+
+        # Check cache, answers are only reused against the same index and graph. The raw query
+        # keeps the pair codes the cache matches on.
+        try:
+            retriever.reload_if_changed()
+        except Exception as e:
+            print(f"Error loading index or documents: {e}")
+        cache.set_version(answer_cache_version(retriever))
+        cached = cache.get(raw_query, query_embedding)
+        if cached is not None:
+            print(f"--- ANALYSIS ---\n\n{cached}\n\n----------------\n")
             continue
 
-        # Generate context from entities and relationships
-        context = []
-        for entity in entities:
-            context.append(f"Entity: {entity['name']}, Label: {entity['label']}")
-        
-        for rel in relationships:
-            context.append(f"Relationship: {rel['source']} -[{rel['type']}- {rel['weight']}-] -> {rel['target']}")
-        
-        context_str = "\n".join(context)
+        # Only the neighborhood of the entities named in the query goes into the prompt
+        context_str = graph_index.context(raw_query)
 
-        # Generate answer from entities and relationships
-        entities_relationships_answer = gemini.generate_answer(query, [context_str])
+        # Without streaming both answers are generated and compared, the graph one in the
+        # background while retrieval runs
+        graph_future = None
+        if context_str and not STREAM_ANSWERS:
+            graph_future = gemini.submit_answer(query, [context_str])
 
         # Generate answer from RAG approach
-        query_embedding = embedder.encode([query], convert_to_numpy=True).astype('float32')
-        faiss.normalize_L2(query_embedding)
-
+        rag_future = None
+        retrieved_contents = None
         try:
-            index = faiss.read_index(FAISS_INDEX_PATH)
-            docs = data_loader.load_documents(DOC_PATH)
-            if isinstance(index, faiss.IndexIVF):
-                index.nprobe = 10  # Set nprobe for IndexIVF
+            # Pairs, "news"/"strategy" and time windows like "last 24h" named in the query narrow the search
+            filters = parse_query_filters(raw_query)
+            retrieved_docs = retriever.search(query_embedding, 10, query_text=raw_query, filters=filters)
         except Exception as e:
             print(f"Error loading index or documents: {e}")
-            rag_answer = "Error generating answer from RAG approach."
+            rag_answer = AnswerError("Error generating answer from RAG approach.")
         else:
-            if index.ntotal == 0:
-                rag_answer = "No documents indexed for RAG approach."
+            if not retrieved_docs:
+                rag_answer = AnswerError("No documents indexed for RAG approach.")
             else:
-                _, indices = index.search(query_embedding, 10)
-                # Extract the content from the retrieved documents
-            retrieved_contents = [docs[i]['content'] for i in indices[0] if i < len(docs)]
-            rag_answer = gemini.generate_answer(query, retrieved_contents)
+                # Extract the content from the retrieved passages
+                retrieved_contents = [doc['content'] for doc in retrieved_docs]
+                # Token counts are cached per passage for as long as the index version holds
+                doc_ids = [(retriever.version, doc['id']) for doc in retrieved_docs]
+                if not STREAM_ANSWERS:
+                    rag_future = gemini.submit_answer(query, retrieved_contents, doc_ids=doc_ids)
+
+        if STREAM_ANSWERS:
+            # Only the answer shown is generated: the RAG one, or the graph one when retrieval
+            # found nothing or the RAG stream failed
+            answer = None
+            if retrieved_contents:
+                answer = print_stream(gemini.stream_answer(query, retrieved_contents, doc_ids=doc_ids))
+            if (answer is None or isinstance(answer, AnswerError)) and context_str:
+                answer = print_stream(gemini.stream_answer(query, [context_str]))
+            if answer is None:
+                print("--- ANALYSIS ---\n\nUnable to generate an answer from both approaches.\n\n----------------\n")
+            elif not isinstance(answer, AnswerError):
+                cache.put(raw_query, query_embedding, f"{answer}\n")
+            continue
+
+        # Both LLM calls are in flight together, latency is the slower of the two
+        if graph_future is not None:
+            entities_relationships_answer = gemini.wait_for_answer(graph_future)
+        else:
+            entities_relationships_answer = AnswerError("Error: no knowledge graph entities match the query.")
+        if rag_future is not None:
+            rag_answer = gemini.wait_for_answer(rag_future)
 
         # Compare and select the best answer
-        if "error" in entities_relationships_answer.lower() and "error" in rag_answer.lower():
+        if isinstance(entities_relationships_answer, AnswerError) and isinstance(rag_answer, AnswerError):
             answer = "Unable to generate an answer from both approaches."
             source = "both approaches failed"
-        elif "error" in entities_relationships_answer.lower():
+        elif isinstance(entities_relationships_answer, AnswerError):
             answer = rag_answer
             source = "RAG approach"
-        elif "error" in rag_answer.lower():
+        elif isinstance(rag_answer, AnswerError):
             answer = entities_relationships_answer
             source = "knowledge graph"
         else:
+            source = "both approaches"
             # Simple comparison based on length (more detailed answer)
             if len(entities_relationships_answer) > len(rag_answer):
                 answer = entities_relationships_answer
@@ -169,8 +311,13 @@ def main():
         # Format the final response with the source information
         final_response = f"{answer}\n"
 
-        cache[query] = f"{final_response}"
+        if source != "both approaches failed":
+            cache.put(raw_query, query_embedding, final_response)
         print(f"--- ANALYSIS ---\n\n{final_response}\n\n----------------\n")
 
+    gemini.close()
+    cache.close()
+    encoder.close()
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,129 @@
+import os
+import time
+import faiss
+import numpy as np
+import data_loader
+import doc_store
+import index_factory
+from sparse_index import BM25Index, reciprocal_rank_fusion
+from metadata_index import MetadataIndex
+
+class Retriever:
+    # Keeps the FAISS index and the memory-mapped document store open between queries.
+    # Both are reloaded only when index.idx or the document store changes on disk. nprobe or
+    # efSearch come from the index's tuned parameters unless given here.
+    def __init__(self, index_path, doc_path, nprobe=None, efSearch=None, mmap=True, sparse_path=None, candidates=50,
+                 metadata_path=None):
+        self.index_path = index_path
+        self.doc_path = doc_path
+        self.sparse_path = sparse_path
+        self.metadata_path = metadata_path
+        self.candidates = candidates
+        self.sparse = None
+        self.metadata = None
+        self.nprobe = nprobe
+        self.efSearch = efSearch
+        self.params = {}
+        self.mmap = mmap
+        self.index = None
+        self.docs = None
+        self.version = None
+        self.timings = {
+            'load_seconds': 0.0,
+            'search_seconds': 0.0,
+            'loads': 0,
+            'searches': 0
+        }
+
+    def _file_version(self):
+        version = []
+        paths = (self.index_path,) + doc_store.store_files(self.doc_path)
+        for path in (index_factory.params_path(self.index_path), self.sparse_path, self.metadata_path):
+            if path and os.path.exists(path):
+                paths += (path,)
+        for path in paths:
+            stat = os.stat(path)
+            version.append((stat.st_mtime_ns, stat.st_size))
+        return tuple(version)
+
+    def _read_index(self):
+        if self.mmap:
+            try:
+                # Maps the inverted lists instead of copying them onto the heap
+                return faiss.read_index(self.index_path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+            except RuntimeError as e:
+                print(f"Memory-mapped index load failed, reading into memory: {e}")
+        return faiss.read_index(self.index_path)
+
+    def reload_if_changed(self):
+        version = self._file_version()
+        if version == self.version:
+            return False
+
+        start = time.perf_counter()
+        index = self._read_index()
+        params = index_factory.load_params(self.index_path)
+        overrides = {'nprobe': self.nprobe, 'efSearch': self.efSearch}
+        index_factory.apply_search_params(index, {name: value for name, value in overrides.items() if value})
+        docs = data_loader.load_documents(self.doc_path)
+        if self.sparse_path and os.path.exists(self.sparse_path):
+            self.sparse = BM25Index.load(self.sparse_path)
+        if self.metadata_path and os.path.exists(self.metadata_path):
+            self.metadata = MetadataIndex.load(self.metadata_path)
+        if self.docs is not None:
+            self.docs.close()
+        self.index, self.docs, self.version, self.params = index, docs, version, params
+
+        self.timings['load_seconds'] = time.perf_counter() - start
+        self.timings['loads'] += 1
+        return True
+
+    def _search_allowed(self, query_embedding, count, allowed):
+        # Restricts the FAISS search to the allowed ids. A small allowed set may sit in a few
+        # clusters or graph regions far from the query, so it is searched exhaustively: by
+        # probing every inverted list, or by scoring the stored vectors of id-mapped indexes.
+        small = len(allowed) <= 10 * self.candidates
+        if small and isinstance(self.index, faiss.IndexIDMap):
+            vectors = np.vstack([self.index.reconstruct(int(i)) for i in allowed])
+            order = np.argsort(-(vectors @ query_embedding[0]))[:count]
+            return allowed[order][None, :]
+        params = index_factory.search_parameters(self.index, faiss.IDSelectorBatch(allowed), exhaustive=small)
+        _, indices = self.index.search(query_embedding, count, params=params)
+        return indices
+
+    def search(self, query_embedding, k=10, query_text=None, filters=None):
+        # With query_text and a BM25 index, dense and sparse candidates are merged with
+        # reciprocal rank fusion; otherwise this is a plain dense search. filters (pairs,
+        # doc_type, since, until) restrict both searches to matching passages, and are
+        # dropped when nothing matches them.
+        self.reload_if_changed()
+        if self.index.ntotal == 0:
+            return []
+
+        start = time.perf_counter()
+        allowed = None
+        if filters and self.metadata is not None:
+            allowed = self.metadata.select(**filters)
+            if allowed is not None and len(allowed) == 0:
+                print("No documents match the query filters, searching all documents.")
+                allowed = None
+        hybrid = query_text is not None and self.sparse is not None
+        count = max(k, self.candidates) if hybrid else k
+        if allowed is None:
+            _, indices = self.index.search(query_embedding, count)
+        else:
+            indices = self._search_allowed(query_embedding, count, allowed)
+        ranking = [int(i) for i in indices[0] if i >= 0]
+        if hybrid:
+            allowed_set = None if allowed is None else set(allowed.tolist())
+            sparse_ranking = self.sparse.search(query_text, self.candidates, allowed=allowed_set)
+            ranking = reciprocal_rank_fusion([ranking, sparse_ranking])[:k]
+        results = []
+        for i in ranking:
+            doc = self.docs[i] if 0 <= i < len(self.docs) else None
+            if doc is not None:
+                doc['id'] = int(i)
+                results.append(doc)
+        self.timings['search_seconds'] = time.perf_counter() - start
+        self.timings['searches'] += 1
+        return results
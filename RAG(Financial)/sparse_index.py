@@ -0,0 +1,112 @@
+import os
+import re
+import math
+import heapq
+import pickle
+from collections import Counter, defaultdict
+
+# Keeps tickers, pair codes and amounts such as "usdjpyc", "eur/usd" or "ksh.15.4b" whole
+_TERM_RE = re.compile(r"[a-z0-9]+(?:[./][a-z0-9]+)*")
+
+def tokenize(text):
+    terms = []
+    for term in _TERM_RE.findall(text.lower()):
+        terms.append(term)
+        if '/' in term or '.' in term:
+            parts = re.split(r'[./]', term)
+            terms.extend(parts)
+            if '/' in term:
+                terms.append(''.join(parts))  # eur/usd also matches eurusd
+        elif len(term) == 7 and term.isalpha() and term.endswith('c'):
+            terms.append(term[:6])  # Broker suffix, usdjpyc also matches usdjpy
+    return terms
+
+def reciprocal_rank_fusion(rankings, k=60):
+    # Merges ranked id lists by summing 1 / (k + rank) over the lists each id appears in
+    scores = defaultdict(float)
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            scores[doc_id] += 1.0 / (k + rank + 1)
+    return sorted(scores, key=scores.get, reverse=True)
+
+class BM25Index:
+    # Inverted index with term frequencies per passage id, maintained alongside the FAISS
+    # index so exact tokens can be matched without a bigger embedding model
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings = defaultdict(dict)  # term -> {doc_id: term frequency}
+        self.doc_lengths = {}
+        self.total_length = 0
+
+    def __len__(self):
+        return len(self.doc_lengths)
+
+    def add(self, doc_id, text):
+        if doc_id in self.doc_lengths:
+            self.remove(doc_id)
+        terms = tokenize(text)
+        for term, frequency in Counter(terms).items():
+            self.postings[term][doc_id] = frequency
+        self.doc_lengths[doc_id] = len(terms)
+        self.total_length += len(terms)
+
+    def remove(self, doc_id, text=None):
+        length = self.doc_lengths.pop(doc_id, None)
+        if length is None:
+            return
+        self.total_length -= length
+        terms = set(tokenize(text)) if text is not None else list(self.postings)
+        for term in terms:
+            posting = self.postings.get(term)
+            if posting is not None and posting.pop(doc_id, None) is not None and not posting:
+                del self.postings[term]
+
+    def remap(self, mapping):
+        # Renumbers passage ids after the document store is compacted
+        self.postings = defaultdict(dict, {
+            term: {mapping[doc_id]: frequency for doc_id, frequency in posting.items() if doc_id in mapping}
+            for term, posting in self.postings.items()
+        })
+        self.doc_lengths = {mapping[doc_id]: length for doc_id, length in self.doc_lengths.items() if doc_id in mapping}
+        self.total_length = sum(self.doc_lengths.values())
+
+    def search(self, query, k=10, allowed=None):
+        if not self.doc_lengths:
+            return []
+        count = len(self.doc_lengths)
+        average_length = self.total_length / count
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            idf = math.log(1 + (count - len(posting) + 0.5) / (len(posting) + 0.5))
+            for doc_id, frequency in posting.items():
+                if allowed is not None and doc_id not in allowed:
+                    continue
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / average_length)
+                scores[doc_id] += idf * frequency * (self.k1 + 1) / (frequency + norm)
+        return heapq.nlargest(k, scores, key=scores.get)
+
+    def save(self, file_path):
+        os.makedirs(os.path.dirname(file_path) or '.', exist_ok=True)
+        tmp_path = file_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump({
+                'k1': self.k1,
+                'b': self.b,
+                'postings': dict(self.postings),
+                'doc_lengths': self.doc_lengths
+            }, f)
+        os.replace(tmp_path, file_path)
+
+    @classmethod
+    def load(cls, file_path):
+        with open(file_path, 'rb') as f:
+            state = pickle.load(f)
+        index = cls(state['k1'], state['b'])
+        index.postings = defaultdict(dict, state['postings'])
+        index.doc_lengths = state['doc_lengths']
+        index.total_length = sum(index.doc_lengths.values())
+        return index
@@ -0,0 +1,132 @@
+import os
+from collections import OrderedDict
+import numpy as np
+
+# Fields of the rate arrays MetaTrader returns, which every provider serves
+RATE_DTYPE = np.dtype([
+    ('time', 'i8'), ('open', 'f8'), ('high', 'f8'), ('low', 'f8'), ('close', 'f8'),
+    ('tick_volume', 'i8'), ('spread', 'i4'), ('real_volume', 'i8')
+])
+
+class MarketDataProvider:
+    # Source of OHLC bars: rates() returns the latest bars of a symbol on a timeframe as a
+    # structured array ordered oldest first, or None when there are none
+    def connect(self):
+        return True
+
+    def close(self):
+        pass
+
+    def rates(self, symbol, timeframe, bars):
+        raise NotImplementedError
+
+class MT5Provider(MarketDataProvider):
+    # Bars from a running MetaTrader 5 terminal
+    def __init__(self):
+        self.mt5 = None
+
+    def connect(self):
+        # Imported here, the package only exists on Windows next to a terminal
+        import MetaTrader5 as mt5
+        self.mt5 = mt5
+        if not mt5.initialize():
+            print(f"Initialize failed, error code: {mt5.last_error()}")
+            return False
+        print("Connected to MetaTrader 5")
+        return True
+
+    def close(self):
+        if self.mt5 is not None:
+            self.mt5.shutdown()
+            print("Disconnected from MetaTrader 5")
+
+    def rates(self, symbol, timeframe, bars):
+        return self.mt5.copy_rates_from_pos(symbol, getattr(self.mt5, f"TIMEFRAME_{timeframe}"), 0, bars)
+
+def _to_rates(df):
+    # Structured rate array from a DataFrame with time and OHLC columns; times may be epoch
+    # seconds or datetimes
+    import pandas as pd
+    rates = np.zeros(len(df), dtype=RATE_DTYPE)
+    time = df['time']
+    if not pd.api.types.is_numeric_dtype(time):
+        time = pd.to_datetime(time, utc=True).astype('int64') // 10 ** 9
+    rates['time'] = np.asarray(time, dtype='int64')
+    for field in RATE_DTYPE.names[1:]:
+        if field in df:
+            rates[field] = df[field].to_numpy()
+    return rates
+
+class LocalProvider(MarketDataProvider):
+    # Bars replayed from files named <SYMBOL>_<TIMEFRAME>.npy|.parquet|.csv in a directory.
+    # .npy files hold rate arrays and are memory-mapped; Parquet and CSV are parsed once per
+    # file version. The most recently requested (symbol, timeframe, bars) windows are kept
+    # and dropped when their file changes.
+    EXTENSIONS = ('.npy', '.parquet', '.csv')
+
+    def __init__(self, directory, cache_size=128):
+        self.directory = directory
+        self.cache_size = cache_size
+        self.windows = OrderedDict()
+        self.series = {}
+        self.stats = {'hits': 0, 'misses': 0}
+
+    def _path(self, symbol, timeframe):
+        for extension in self.EXTENSIONS:
+            path = os.path.join(self.directory, f"{symbol}_{timeframe}{extension}")
+            if os.path.exists(path):
+                return path
+        return None
+
+    def _load(self, path, version):
+        cached = self.series.get(path)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        if path.endswith('.npy'):
+            rates = np.load(path, mmap_mode='r')
+        else:
+            import pandas as pd
+            df = pd.read_parquet(path) if path.endswith('.parquet') else pd.read_csv(path)
+            rates = _to_rates(df)
+        self.series[path] = (version, rates)
+        return rates
+
+    def rates(self, symbol, timeframe, bars):
+        path = self._path(symbol, timeframe)
+        if path is None:
+            return None
+        stat = os.stat(path)
+        version = (stat.st_mtime_ns, stat.st_size)
+        key = (symbol, timeframe, bars)
+        cached = self.windows.get(key)
+        if cached is not None and cached[0] == version:
+            self.windows.move_to_end(key)
+            self.stats['hits'] += 1
+            return cached[1]
+
+        self.stats['misses'] += 1
+        window = np.array(self._load(path, version)[-bars:])  # Copied out of the memory map
+        self.windows[key] = (version, window)
+        self.windows.move_to_end(key)
+        while len(self.windows) > self.cache_size:
+            self.windows.popitem(last=False)
+        return window
+
+    def save(self, symbol, timeframe, rates):
+        # Records bars, e.g. from MT5Provider, for replay
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{symbol}_{timeframe}.npy")
+        tmp_path = path + '.tmp.npy'
+        np.save(tmp_path, np.asarray(rates))
+        os.replace(tmp_path, path)
+
+    def close(self):
+        self.windows.clear()
+        self.series.clear()
+
+def get_provider():
+    # MARKET_DATA_DIR replays bars from local files, otherwise they come from MetaTrader 5
+    directory = os.getenv("MARKET_DATA_DIR")
+    if directory:
+        return LocalProvider(directory)
+    return MT5Provider()
@@ -0,0 +1,266 @@
+import numpy as np
+import os
+import datetime as dt
+from scipy.signal import lfilter
+from market_data import get_provider
+
+# Symbols each strategy scans
+UNIVERSE = {
+    'bounce': ['EURUSDc', 'NZDUSDc', 'GBPUSDc', 'AUDUSDc', 'USDJPYc', 'AUDJPYc', 'GBPJPYc', 'EURJPYc', 'USDCHFc', 'NZDJPYc', 'USDCADc'],
+    'daily_bias': ['EURUSDc', 'NZDUSDc', 'USDJPYc', 'USDCADc'],
+    'trend_continuation': ['EURUSDc', 'USDJPYc', 'USDCADc'],
+}
+# (timeframe, bars) windows each strategy reads; a window is fetched once for every strategy using it
+WINDOWS = {
+    'bounce': (('M15', 500), ('H1', 500)),
+    'daily_bias': (('D1', 250),),
+    'trend_continuation': (('H1', 500),),
+}
+FIELDS = ('open', 'high', 'low', 'close')
+PIP_SIZE = 1e-4  # Assuming 4 decimal place pairs
+STRATEGIES_DIR = os.path.join("data", "strategies")
+
+def ema(values, span, adjust=False):
+    # pandas ewm(span=span, adjust=adjust).mean() along the last axis of a (symbol x time)
+    # array as one recursive filter. Rows are right-aligned with NaN before their first bar.
+    alpha = 2.0 / (span + 1)
+    decay = 1.0 - alpha
+    valid = ~np.isnan(values)
+    if adjust:
+        # Weighted mean over each row's history: filtered values over filtered weights
+        numerator = lfilter([1.0], [1.0, -decay], np.where(valid, values, 0.0), axis=-1)
+        denominator = lfilter([1.0], [1.0, -decay], valid.astype('float64'), axis=-1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            result = numerator / denominator
+    else:
+        # Padding with each row's first bar leaves the recursion at that bar until it starts
+        first = np.take_along_axis(values, valid.argmax(axis=-1)[..., None], axis=-1)
+        filled = np.where(valid, values, first)
+        result, _ = lfilter([alpha], [1.0, -decay], filled, axis=-1, zi=decay * first)
+    result[~valid] = np.nan
+    return result
+
+class Bars:
+    # OHLC bars of several symbols on one timeframe as (symbol x time) arrays aligned on the
+    # latest bar, so column -1 is every symbol's current candle. EMAs are computed once per
+    # span and kept.
+    def __init__(self, symbols, timeframe, bars):
+        self.symbols = list(symbols)
+        self.timeframe = timeframe
+        self.rows = {symbol: row for row, symbol in enumerate(self.symbols)}
+        self.time = np.zeros((len(self.symbols), bars), dtype='int64')
+        self.fields = {field: np.full((len(self.symbols), bars), np.nan) for field in FIELDS}
+        self.lengths = np.zeros(len(self.symbols), dtype='int64')
+        self._emas = {}
+
+    def __getitem__(self, field):
+        return self.fields[field]
+
+    def set_rates(self, symbol, rates):
+        row = self.rows[symbol]
+        rates = rates[-self.time.shape[1]:]
+        n = len(rates)
+        self.time[row, -n:] = rates['time']
+        for field in FIELDS:
+            self.fields[field][row, -n:] = rates[field]
+        self.lengths[row] = n
+        self._emas = {}
+
+    def ema(self, span, adjust=False):
+        if (span, adjust) not in self._emas:
+            self._emas[(span, adjust)] = ema(self.fields['close'], span, adjust)
+        return self._emas[(span, adjust)]
+
+    def take(self, symbols):
+        # Row indices of symbols
+        return np.array([self.rows[symbol] for symbol in symbols], dtype='int64')
+
+def load_bars(provider, symbols, timeframe, bars):
+    data = Bars(symbols, timeframe, bars)
+    for symbol in data.symbols:
+        rates = provider.rates(symbol, timeframe, bars)
+        if rates is None or len(rates) == 0:
+            continue
+        data.set_rates(symbol, rates)
+    return data
+
+def _trend(ema_18, ema_50, ema_200, tolerance=0.0):
+    # 'bullish'/'bearish'/'no trend' per row from the EMAs of the latest bar
+    bullish = (ema_18[:, -1] > ema_50[:, -1] + tolerance) & (ema_50[:, -1] > ema_200[:, -1] + tolerance)
+    bearish = (ema_18[:, -1] < ema_50[:, -1] - tolerance) & (ema_50[:, -1] < ema_200[:, -1] - tolerance)
+    return np.where(bullish, 'bullish', np.where(bearish, 'bearish', 'no trend'))
+
+def bounce_signals(m15, h1, symbols):
+    # M15 trend with a tolerance on EMA 18/50/200, confirmed by the same trend on H1, a candle
+    # crossing EMA 50 within the last four bars and a closed candle in the trend's direction
+    rows, h1_rows = m15.take(symbols), h1.take(symbols)
+    ema_18, ema_50, ema_200 = (m15.ema(span)[rows] for span in (18, 50, 200))
+    trend = _trend(ema_18, ema_50, ema_200, tolerance=0.0005)
+    h1_trend = _trend(*(h1.ema(span)[h1_rows] for span in (18, 50, 200)), tolerance=0.0005)
+    low, high = m15['low'][rows], m15['high'][rows]
+    crossed = ((low[:, -4:] < ema_50[:, -4:]) & (high[:, -4:] > ema_50[:, -4:])).any(axis=1)
+    candle_open, close = m15['open'][rows, -2], m15['close'][rows, -2]
+    direction = np.where(trend == 'bullish', close > candle_open, close < candle_open)
+    hits = (trend != 'no trend') & (trend == h1_trend) & crossed & direction & (m15.lengths[rows] >= 2)
+
+    setups = []
+    for i in np.flatnonzero(hits):
+        row = rows[i]
+        candle = {field: m15[field][row, -2] for field in FIELDS}
+        stoploss, entry, take = _bounce_levels(candle, trend[i])
+        setups.append({
+            'strategy': 'bounce', 'symbol': symbols[i], 'trend': str(trend[i]),
+            'stoploss': stoploss, 'entry': entry, 'take_profit': take,
+            'emas': (ema_18[i, -1], ema_50[i, -1], ema_200[i, -1])
+        })
+    return setups
+
+def _bounce_levels(candle, trend):
+    candle_range = candle['high'] - candle['low']
+    min_sl_pips = 8 * PIP_SIZE
+    if trend == "bullish":
+        if candle_range > 8 * PIP_SIZE:
+            return candle['low'] - PIP_SIZE, candle['low'], candle['low'] + PIP_SIZE * 40
+        return candle['open'] - min_sl_pips, candle['high'] + PIP_SIZE * 2, candle['high'] + PIP_SIZE * 40
+    if candle_range > 8 * PIP_SIZE:
+        return candle['high'] + PIP_SIZE, candle['high'], candle['high'] - PIP_SIZE * 40
+    return candle['open'] + min_sl_pips, candle['low'] - PIP_SIZE * 2, candle['low'] - PIP_SIZE * 40
+
+def daily_bias_signals(d1, symbols):
+    # D1 bias from EMA 50 against EMA 200, entered on a hammer/hanging man, an engulfing
+    # candle or simply a candle closing in the bias' direction
+    rows = d1.take(symbols)
+    ema_50, ema_200 = d1.ema(50, adjust=True)[rows], d1.ema(200, adjust=True)[rows]
+    bullish = ema_50[:, -1] > ema_200[:, -1]
+    candle_open, high, low, close = (d1[field][rows, -1] for field in FIELDS)
+    prev_open, prev_close = d1['open'][rows, -2], d1['close'][rows, -2]
+    has_prev = d1.lengths[rows] >= 2
+
+    body = np.abs(close - candle_open)
+    lower_shadow = np.where(close >= candle_open, candle_open - low, close - low)
+    long_shadow = lower_shadow >= 2 * body
+    bullish_pattern = (body != 0) & (long_shadow | (has_prev & (close > prev_open) & (candle_open < prev_close)))
+    bearish_pattern = (body != 0) & (long_shadow | (has_prev & (close < prev_open) & (candle_open > prev_close)))
+    hits = np.where(bullish, bullish_pattern | (close > candle_open), bearish_pattern | (close < candle_open))
+    hits &= d1.lengths[rows] >= 1
+
+    setups = []
+    for i in np.flatnonzero(hits):
+        trend = 'bullish' if bullish[i] else 'bearish'
+        sign = 1 if bullish[i] else -1
+        setups.append({
+            'strategy': 'daily_bias', 'symbol': symbols[i], 'trend': trend,
+            'stoploss': close[i] - sign * 5 * PIP_SIZE, 'entry': close[i] + sign * PIP_SIZE,
+            'take_profit': close[i] + sign * 15 * PIP_SIZE,
+            'emas': (None, ema_50[i, -1], ema_200[i, -1]),
+            'candle': 'Bullish' if close[i] > candle_open[i] else 'Bearish'
+        })
+    return setups
+
+def trend_continuation_signals(h1, symbols):
+    # H1 trend from strictly ordered EMA 18/50/200 with a higher high and higher low (or lower
+    # high and lower low) than three bars back
+    rows = h1.take(symbols)
+    ema_18, ema_50, ema_200 = (h1.ema(span, adjust=True)[rows] for span in (18, 50, 200))
+    trend = _trend(ema_18, ema_50, ema_200)
+    high, low = h1['high'][rows], h1['low'][rows]
+    higher = (high[:, -1] > high[:, -4]) & (low[:, -1] > low[:, -4])
+    lower = (high[:, -1] < high[:, -4]) & (low[:, -1] < low[:, -4])
+    hits = np.where(trend == 'bullish', higher, (trend == 'bearish') & lower) & (h1.lengths[rows] >= 4)
+
+    setups = []
+    for i in np.flatnonzero(hits):
+        row = rows[i]
+        sign = 1 if trend[i] == 'bullish' else -1
+        close = h1['close'][row, -2]
+        stop_base = h1['low'][row, -2] if sign > 0 else h1['high'][row, -2]
+        setups.append({
+            'strategy': 'trend_continuation', 'symbol': symbols[i], 'trend': str(trend[i]),
+            'stoploss': stop_base - sign * 10 * PIP_SIZE, 'entry': close + sign * 2 * PIP_SIZE,
+            'take_profit': close + sign * 15 * PIP_SIZE,
+            'emas': (ema_18[i, -1], ema_50[i, -1], ema_200[i, -1]),
+            'candle': 'Bullish' if h1['close'][row, -1] > h1['open'][row, -1] else 'Bearish'
+        })
+    return setups
+
+def scan(provider, universe=None):
+    # Loads every (timeframe, bars) window the strategies need once for all their symbols
+    # and evaluates each strategy's rules over all of its symbols at once
+    universe = universe or UNIVERSE
+    symbols = {}
+    for strategy, strategy_symbols in universe.items():
+        for window in WINDOWS[strategy]:
+            symbols.setdefault(window, {}).update(dict.fromkeys(strategy_symbols))
+    bars = {window: load_bars(provider, list(names), *window) for window, names in symbols.items()}
+
+    setups = []
+    if 'bounce' in universe:
+        # The H1 confirmation reads the same bars trend continuation uses
+        setups += bounce_signals(bars[('M15', 500)], bars[('H1', 500)], universe['bounce'])
+    if 'daily_bias' in universe:
+        setups += daily_bias_signals(bars[('D1', 250)], universe['daily_bias'])
+    if 'trend_continuation' in universe:
+        setups += trend_continuation_signals(bars[('H1', 500)], universe['trend_continuation'])
+    return setups
+
+def format_report(setup):
+    # Report text and file name in the format each strategy has always written
+    symbol, trend = setup['symbol'], setup['trend']
+    ema_18, ema_50, ema_200 = setup['emas']
+    levels = (
+        f"Stoploss: {setup['stoploss']:.5f}\n"
+        f"EntryPrice: {setup['entry']:.5f}\n"
+        f"TakeProfit: {setup['take_profit']:.5f}\n"
+    )
+    if setup['strategy'] == 'bounce':
+        timestamp = dt.datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+        content = (
+            f"Symbol: {symbol}\n"
+            f"Strategy: Bounce\n"
+            f"Trend: {trend}\n"
+            f"EMAs: EMA18={ema_18:.5f}, EMA50={ema_50:.5f}, EMA200={ema_200:.5f}\n"
+            f"Candle Pattern: Bounce detected\n"
+            f"{levels}"
+            f"Timestamp: {timestamp}"
+        )
+        # Remove the .000 from microseconds for brevity
+        return content, f"{timestamp}_{symbol}_bounce.txt".replace('.000', '')
+
+    timestamp = dt.datetime.now().strftime('%Y%m%d_%H%M%S')
+    if setup['strategy'] == 'daily_bias':
+        name, filename, ema_18_text = 'DailyBiasCandlePatterns', f"{timestamp}_{symbol}_{trend}.txt", "1.23456"
+    else:
+        name, filename, ema_18_text = 'TrendContinuation', f"{timestamp}_{symbol}_{trend}_continuation.txt", f"{ema_18:.5f}"
+    content = (
+        f"Symbol: {symbol}\nStrategy: {name}\nTrend: {trend}\n"
+        f"{levels}"
+        f"EMAs: EMA18={ema_18_text}, EMA50={ema_50:.5f}, EMA200={ema_200:.5f}\n"
+        f"Candle Pattern: {setup['candle']}"
+    )
+    return content, filename
+
+def write_reports(setups, directory=STRATEGIES_DIR):
+    os.makedirs(directory, exist_ok=True)
+    for setup in setups:
+        content, filename = format_report(setup)
+        with open(os.path.join(directory, filename), 'w') as f:
+            f.write(content)
+
+def run(strategies=None, provider=None):
+    # Scans the given strategies (all by default) in one pass and writes a report per setup.
+    # Bars come from MetaTrader 5 unless MARKET_DATA_DIR points at recorded ones.
+    universe = {name: UNIVERSE[name] for name in (strategies or UNIVERSE)}
+    provider = provider or get_provider()
+    if not provider.connect():
+        return []
+    try:
+        setups = scan(provider, universe)
+        for setup in setups:
+            print(f"Valid {setup['strategy']} setup ({setup['trend']}) for {setup['symbol']}.")
+        write_reports(setups)
+    finally:
+        provider.close()
+    return setups
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,120 @@
+# The per-symbol rules of the bounce, daily bias and trend continuation scripts as they were
+# before the shared scanner, reading bars from a market-data provider instead of MT5
+import pandas as pd
+
+def _frame(provider, symbol, timeframe, bars):
+    rates = provider.rates(symbol, timeframe, bars)
+    if rates is None or len(rates) == 0:
+        return None
+    return pd.DataFrame(rates)
+
+def _bounce_trend(ema_18, ema_50, ema_200, tolerance=0.0005):
+    if ema_18.iloc[-1] > ema_50.iloc[-1] + tolerance and ema_50.iloc[-1] > ema_200.iloc[-1] + tolerance:
+        return "bullish"
+    elif ema_18.iloc[-1] < ema_50.iloc[-1] - tolerance and ema_50.iloc[-1] < ema_200.iloc[-1] - tolerance:
+        return "bearish"
+    return "no trend"
+
+def _with_emas(df):
+    for span in (18, 50, 200):
+        df[f'ema_{span}'] = df['close'].ewm(span=span, adjust=False).mean()
+    return df
+
+def bounce(provider, symbol):
+    try:
+        df = _frame(provider, symbol, 'M15', 500)
+        if df is None or df.empty:
+            return None
+        df = _with_emas(df)
+        trend = _bounce_trend(df['ema_18'], df['ema_50'], df['ema_200'])
+        if trend == "no trend":
+            return None
+        h1 = _frame(provider, symbol, 'H1', 500)
+        if h1 is None:
+            return None
+        h1 = _with_emas(h1)
+        if _bounce_trend(h1['ema_18'], h1['ema_50'], h1['ema_200']) != trend:
+            return None
+        last_candles = df.iloc[-4:]
+        crossed = (last_candles['low'] < df['ema_50'].iloc[-4:]) & (last_candles['high'] > df['ema_50'].iloc[-4:])
+        if not crossed.any():
+            return None
+        candle = df.iloc[-2]
+        if not (candle['close'] > candle['open'] if trend == "bullish" else candle['close'] < candle['open']):
+            return None
+    except Exception:
+        return None  # The script printed the error and moved on
+
+    pip_size = 1e-4
+    candle_range = candle['high'] - candle['low']
+    if trend == "bullish":
+        stoploss, entry, take = candle['open'] - 8 * pip_size, candle['high'] + pip_size * 2, candle['high'] + pip_size * 40
+        if candle_range > 8 * pip_size:
+            stoploss, entry, take = candle['low'] - pip_size, candle['low'], candle['low'] + pip_size * 40
+    else:
+        stoploss, entry, take = candle['open'] + 8 * pip_size, candle['low'] - pip_size * 2, candle['low'] - pip_size * 40
+        if candle_range > 8 * pip_size:
+            stoploss, entry, take = candle['high'] + pip_size, candle['high'], candle['high'] - pip_size * 40
+    return ('bounce', symbol, trend, stoploss, entry, take,
+            (df['ema_18'].iloc[-1], df['ema_50'].iloc[-1], df['ema_200'].iloc[-1]))
+
+def daily_bias(provider, symbol):
+    df = _frame(provider, symbol, 'D1', 250)
+    if df is None or df.empty:
+        return None
+    ema_50 = df['close'].ewm(span=50).mean().iloc[-1]
+    ema_200 = df['close'].ewm(span=200).mean().iloc[-1]
+    trend = 'bullish' if ema_50 > ema_200 else 'bearish'
+    last, prev = df.iloc[-1], None if len(df) < 2 else df.iloc[-2]
+
+    body = abs(last['close'] - last['open'])
+    lower_shadow = last['open'] - last['low'] if last['close'] >= last['open'] else last['close'] - last['low']
+    if trend == 'bullish':
+        engulfing = prev is not None and last['close'] > prev['open'] and last['open'] < prev['close']
+        hit = (body != 0 and (lower_shadow >= 2 * body or engulfing)) or last['close'] > last['open']
+    else:
+        engulfing = prev is not None and last['close'] < prev['open'] and last['open'] > prev['close']
+        hit = (body != 0 and (lower_shadow >= 2 * body or engulfing)) or last['close'] < last['open']
+    if not hit:
+        return None
+    sign = 1 if trend == 'bullish' else -1
+    close = last['close']
+    return ('daily_bias', symbol, trend, close - sign * 5e-4, close + sign * 1e-4, close + sign * 15e-4,
+            (None, ema_50, ema_200))
+
+def trend_continuation(provider, symbol):
+    df = _frame(provider, symbol, 'H1', 500)
+    if df is None or df.empty:
+        return None
+    emas = [df['close'].ewm(span=span).mean() for span in (18, 50, 200)]
+    ema_18, ema_50, ema_200 = (ema.iloc[-1] for ema in emas)
+    if ema_18 > ema_50 > ema_200:
+        trend = 'bullish'
+    elif ema_18 < ema_50 < ema_200:
+        trend = 'bearish'
+    else:
+        return None
+    if len(df) < 4:
+        return None
+    high, low = df['high'], df['low']
+    if trend == 'bullish' and not (high.iloc[-1] > high.iloc[-4] and low.iloc[-1] > low.iloc[-4]):
+        return None
+    if trend == 'bearish' and not (high.iloc[-1] < high.iloc[-4] and low.iloc[-1] < low.iloc[-4]):
+        return None
+    candle = df.iloc[-2]
+    if trend == 'bullish':
+        levels = candle['low'] - 10e-4, candle['close'] + 2e-4, candle['close'] + 15e-4
+    else:
+        levels = candle['high'] + 10e-4, candle['close'] - 2e-4, candle['close'] - 15e-4
+    return ('trend_continuation', symbol, trend, *levels, (ema_18, ema_50, ema_200))
+
+RULES = {'bounce': bounce, 'daily_bias': daily_bias, 'trend_continuation': trend_continuation}
+
+def reference_setups(provider, universe):
+    setups = []
+    for strategy, symbols in universe.items():
+        for symbol in symbols:
+            setup = RULES[strategy](provider, symbol)
+            if setup is not None:
+                setups.append(setup)
+    return setups
@@ -0,0 +1,31 @@
+import numpy as np
+from answer_cache import AnswerCache
+
+def unit(*values):
+    vector = np.array(values, dtype='float32')
+    return vector / np.linalg.norm(vector)
+
+def test_near_duplicates_must_ask_about_the_same_pairs_and_window(tmp_path):
+    cache = AnswerCache(str(tmp_path / 'answers.sqlite'), version='v1')
+    cache.put('EUR/USD outlook last week', unit(1, 0, 0), 'euro answer')
+    close = unit(1, 0.01, 0)
+    assert cache.get('eur/usd outlook last week', close) == 'euro answer'
+    assert cache.get('What is the EURUSD outlook for the past 7 days', close) == 'euro answer'
+    assert cache.get('GBP/USD outlook last week', close) is None
+    assert cache.get('EUR/USD outlook last 24h', close) is None
+    assert cache.get('EUR/USD outlook', close) is None
+    cache.close()
+
+def test_caches_without_filters_only_serve_exact_repeats(tmp_path):
+    path = str(tmp_path / 'answers.sqlite')
+    cache = AnswerCache(path, version='v1')
+    cache.conn.execute("ALTER TABLE answers DROP COLUMN filters")
+    cache.conn.execute("INSERT INTO answers VALUES (?, 'v1', 'eurusd', ?, 'old answer', 1e12, 1e12)",
+                       (cache._key('EURUSD news'), unit(1, 0).tobytes()))
+    cache.conn.commit()
+    cache.close()
+
+    cache = AnswerCache(path, version='v1')
+    assert cache.get('EURUSD news', unit(1, 0)) == 'old answer'
+    assert cache.get('EURUSD headlines', unit(1, 0)) is None
+    cache.close()
@@ -0,0 +1,25 @@
+import os
+import pytest
+import doc_store
+
+def mapped_files():
+    with open('/proc/self/maps') as f:
+        return {line.split()[-1] for line in f if line.strip().endswith('.npy')}
+
+@pytest.mark.skipif(not os.path.exists('/proc/self/maps'), reason="needs /proc to list mappings")
+def test_offsets_are_unmapped_before_they_are_replaced(tmp_path, monkeypatch):
+    base = str(tmp_path / 'docs')
+    doc_store.write_documents([{'content': 'a'}, {'content': 'b'}], base)
+    store = doc_store.DocumentStore(base)
+    assert store.offsets_path in mapped_files()
+
+    write_offsets = doc_store._write_offsets
+    def checked_write(offsets, offsets_path):
+        assert offsets_path not in mapped_files()
+        write_offsets(offsets, offsets_path)
+    monkeypatch.setattr(doc_store, '_write_offsets', checked_write)
+
+    store.append([{'content': 'c'}])
+    store.delete([0])
+    assert [doc and doc['content'] for doc in store] == [None, 'b', 'c']
+    store.close()
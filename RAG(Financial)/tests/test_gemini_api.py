@@ -0,0 +1,206 @@
+import json
+import re
+import time
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import pytest
+import gemini_api
+from gemini_api import GeminiClient, AnswerError
+from http_client import HttpTransport
+
+def sse_event(*texts):
+    parts = [{'text': text} for text in texts]
+    return f"data: {json.dumps({'candidates': [{'content': {'parts': parts}}]})}\n\n".encode()
+
+def answer_body(*texts):
+    return {'candidates': [{'content': {'parts': [{'text': text} for text in texts]}}]} if texts else {'candidates': []}
+
+class FakeGemini(BaseHTTPRequestHandler):
+    # streamGenerateContent?alt=sse: the events of `stream`; generateContent: `answer` as
+    # JSON. `status` other than 200 is sent as an error response instead, after `delay` seconds.
+    stream = []
+    answer = answer_body('answer')
+    status = 200
+    delay = 0
+    requests = []
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        FakeGemini.requests.append((self.path, json.loads(self.rfile.read(length))))
+        time.sleep(self.delay)
+        try:
+            self._respond()
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # The client gave up waiting
+
+    def _respond(self):
+        if self.status != 200:
+            body = json.dumps({'error': {'message': 'unavailable'}}).encode()
+            self.send_response(self.status)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        if ':generateContent' in self.path:
+            body = json.dumps(self.answer).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.end_headers()
+        for event in self.stream:
+            self.wfile.write(event)
+            self.wfile.flush()
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setenv('GOOGLE_AI_STUDIO_API_KEY', 'test-key')
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeGemini)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    FakeGemini.stream, FakeGemini.answer, FakeGemini.status, FakeGemini.delay = [], answer_body('answer'), 200, 0
+    FakeGemini.requests = []
+    transport = HttpTransport(max_retries=0)
+    gemini = GeminiClient(base_url=f"http://127.0.0.1:{server.server_port}/v1beta", transport=transport)
+    # Token counting needs tiktoken's BPE file, which the context here never comes close to
+    gemini.trim_context = lambda docs, **kwargs: '\n'.join(docs)
+    yield gemini
+    gemini.close()
+    transport.close()
+    server.shutdown()
+    server.server_close()
+
+def test_stream_answer_yields_each_text_part(client):
+    FakeGemini.stream = [
+        sse_event('EUR/USD '),
+        b": keep-alive comment\n\n",
+        sse_event('is ', 'rising'),
+        b"data: {\"candidates\": []}\n\n",
+        sse_event('.'),
+    ]
+    chunks = list(client.stream_answer('eurusd outlook', ['EUR/USD rallied on Fed news']))
+    assert chunks == ['EUR/USD ', 'is ', 'rising', '.']
+
+    path, payload = FakeGemini.requests[0]
+    assert ':streamGenerateContent?alt=sse' in path
+    assert 'EUR/USD rallied on Fed news' in payload['contents'][0]['parts'][0]['text']
+
+def test_stream_answer_reports_http_errors(client):
+    FakeGemini.status = 503
+    chunks = list(client.stream_answer('eurusd outlook', ['context']))
+    assert len(chunks) == 1
+    assert chunks[0].startswith('Error generating answer:')
+
+def test_stream_answer_without_context(client):
+    assert list(client.stream_answer('eurusd outlook', [''])) == ['No valid context found.']
+    assert FakeGemini.requests == []
+
+def test_payload_errors_come_back_as_answers(client):
+    def fail(docs, **kwargs):
+        raise OSError('tiktoken BPE file unavailable')
+    client.trim_context = fail
+    assert client.generate_answer('eurusd outlook', ['context']).startswith('Error generating answer:')
+    chunks = list(client.stream_answer('eurusd outlook', ['context']))
+    assert len(chunks) == 1 and chunks[0].startswith('Error generating answer:')
+    assert FakeGemini.requests == []
+
+def test_failures_are_answer_errors(client):
+    answer = client.generate_answer('eurusd outlook', ['context'])
+    assert answer == 'answer' and not isinstance(answer, AnswerError)
+    FakeGemini.answer = answer_body()
+    answer = client.generate_answer('eurusd outlook', ['context'])
+    assert isinstance(answer, AnswerError) and answer == 'No answer.'
+    client.api_key = None
+    answer = client.generate_answer('eurusd outlook', ['context'])
+    assert isinstance(answer, AnswerError) and answer == 'API key not found.'
+
+def test_submitted_answers_run_concurrently(client):
+    FakeGemini.delay = 0.5
+    start = time.monotonic()
+    futures = [client.submit_answer('eurusd outlook', [context]) for context in ('graph context', 'passages')]
+    answers = [client.wait_for_answer(future) for future in futures]
+    assert answers == ['answer', 'answer']
+    assert time.monotonic() - start < 0.9
+    assert sorted(payload['contents'][0]['parts'][0]['text'].split('\n\n')[1] for _, payload in FakeGemini.requests) == \
+        ['graph context', 'passages']
+
+def test_timed_out_answers_free_their_worker(client):
+    # Every attempt is slow and retryable, so without the deadline the retries outlast the wait
+    client.transport = HttpTransport(max_retries=3, backoff_base=0.05)
+    FakeGemini.status, FakeGemini.delay = 503, 0.4
+    start = time.monotonic()
+    future = client.submit_answer('eurusd outlook', ['context'], timeout=1.0)
+    answer = client.wait_for_answer(future)
+    assert isinstance(answer, AnswerError) and 'timed out' in answer
+    assert time.monotonic() - start < 1.2
+    assert client.wait_for_answer(future, timeout=0.3).startswith('Error generating answer:')
+    assert len(FakeGemini.requests) <= 3
+    client.transport.close()
+
+def test_hung_requests_stop_at_the_deadline(client):
+    FakeGemini.delay = 5
+    start = time.monotonic()
+    future = client.submit_answer('eurusd outlook', ['context'], timeout=0.5)
+    assert isinstance(client.wait_for_answer(future), AnswerError)
+    assert isinstance(future.result(timeout=0.5), AnswerError)
+    assert time.monotonic() - start < 1.2
+
+class WordTokenizer:
+    # One token per word with its trailing whitespace, standing in for tiktoken
+    def __init__(self):
+        self.encoded = []
+
+    def encode(self, text):
+        self.encoded.append(text)
+        return re.findall(r'\S+\s*|\s+', text)
+
+    def decode(self, tokens):
+        return ''.join(tokens)
+
+def words(name, n):
+    return ' '.join(f"{name}{i}" for i in range(n))
+
+@pytest.fixture
+def packer(monkeypatch):
+    tokenizer = WordTokenizer()
+    monkeypatch.setattr(gemini_api, 'get_tokenizer', lambda: tokenizer)
+    transport = HttpTransport(max_retries=0)
+    gemini = GeminiClient(transport=transport)
+    yield gemini, tokenizer
+    gemini.close()
+    transport.close()
+
+def test_trim_context_packs_whole_documents_in_order(packer):
+    client, _ = packer
+    docs = [words('a', 10), words('b', 5), words('c', 20), words('d', 1)]
+    # a and b take 10 + 1 + 5 tokens; c doesn't fit and packing stops there, before d
+    assert client.trim_context(docs, max_tokens=20) == docs[0] + '\n' + docs[1]
+    assert client.trim_context(docs, max_tokens=16) == docs[0] + '\n' + docs[1]
+    assert client.trim_context(docs, max_tokens=15) == docs[0]
+    assert client.trim_context(docs, max_tokens=100) == '\n'.join(docs)
+
+def test_trim_context_cuts_only_an_oversized_first_document(packer):
+    client, _ = packer
+    docs = ['', words('a', 500), words('b', 5)]
+    assert client.trim_context(docs, max_tokens=7) == 'a0 a1 a2 a3 a4 a5 a6 '
+    assert client.trim_context(docs[::-1], max_tokens=7) == docs[2]
+
+def test_trim_context_caches_counts_by_document_id(packer):
+    client, tokenizer = packer
+    docs = ['', words('a', 10), words('b', 5), words('c', 3)]
+    ids = [7, 8, 9, 10]
+    assert client.trim_context(docs, max_tokens=100, doc_ids=ids) == '\n'.join(docs[1:])
+    assert client.token_counts == {8: 10, 9: 5, 10: 3}
+
+    tokenizer.encoded = []
+    assert client.trim_context(docs, max_tokens=100, doc_ids=ids) == '\n'.join(docs[1:])
+    assert tokenizer.encoded == []
+    # Counts follow the ids of a different list of the same documents
+    assert client.trim_context(docs[2:], max_tokens=5, doc_ids=ids[2:]) == docs[2]
+    assert tokenizer.encoded == []
@@ -0,0 +1,61 @@
+import csv
+import pytest
+import knowledge_graph
+from graph_query import LocalGraphQuery, open_graph
+
+NODES = [
+    {'name': 'Federal Reserve', 'label': 'ORG'},
+    {'name': 'USD', 'label': 'MONEY'},
+    {'name': 'EUR', 'label': 'MONEY'},
+    {'name': 'ECB', 'label': 'ORG'},
+]
+RELATIONSHIPS = [
+    {'source': 'Federal Reserve', 'target': 'USD', 'type': 'lifts', 'weight': '3'},
+    {'source': 'USD', 'target': 'EUR', 'type': 'pressures', 'weight': '1'},
+    {'source': 'ECB', 'target': 'EUR', 'type': 'supports', 'weight': '5'},
+]
+
+def write_graph(directory):
+    for name, rows in (('nodes.csv', NODES), ('relationships.csv', RELATIONSHIPS)):
+        with open(directory / name, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+
+def test_open_graph_reads_the_exported_csvs(tmp_path):
+    write_graph(tmp_path)
+    graph = open_graph('local', csv_dir=str(tmp_path))
+    related = graph.find_related_entities('federal reserve', depth=2)
+    assert [row['related']['name'] for row in related] == ['USD', 'EUR']
+    assert [rel['type'] for rel in related[1]['r']] == ['lifts', 'pressures']
+
+def test_shortest_path_follows_edges_both_ways():
+    graph = LocalGraphQuery(NODES, RELATIONSHIPS)
+    [result] = graph.find_shortest_path('Federal Reserve', 'ECB')
+    assert [node['name'] for node in result['path']] == ['Federal Reserve', 'USD', 'EUR', 'ECB']
+    assert result['weight'] == 9.0
+    assert graph.find_shortest_path('Federal Reserve', 'BoJ') == []
+
+def test_neighborhood_of_named_entities_and_cypher_needs_neo4j(monkeypatch):
+    graph = LocalGraphQuery(NODES, RELATIONSHIPS)
+    monkeypatch.setattr(graph, 'find_entities', lambda query: ['eur'])
+    entities, relationships = graph.neighborhood('what moves the euro', hops=1)
+    assert [entity['name'] for entity in entities] == ['EUR']
+    assert [rel['type'] for rel in relationships] == ['supports', 'pressures']
+    with pytest.raises(NotImplementedError):
+        graph.query("MATCH (e:Entity {name: $entity}) RETURN e", {'entity': 'EUR'})
+
+class FakePipe:
+    def __init__(self, listeners=()):
+        self.listening_components = list(listeners)
+
+class FakeNlp:
+    # en_core_web_sm's layout: the parser listens to the shared tok2vec, ner embeds its own
+    pipeline = [('tok2vec', FakePipe(['tagger', 'parser'])), ('tagger', FakePipe()), ('parser', FakePipe()),
+                ('attribute_ruler', FakePipe()), ('lemmatizer', FakePipe()), ('ner', FakePipe())]
+    pipe_names = [name for name, _ in pipeline]
+
+def test_shared_tok2vec_runs_only_for_its_listeners(monkeypatch):
+    monkeypatch.setattr(knowledge_graph, 'get_nlp', FakeNlp)
+    assert knowledge_graph._disabled_pipes(knowledge_graph.ENTITY_PIPES) == ['tok2vec', 'tagger', 'parser', 'attribute_ruler', 'lemmatizer']
+    assert knowledge_graph._disabled_pipes(knowledge_graph.RELATIONSHIP_PIPES) == ['tagger', 'attribute_ruler', 'lemmatizer', 'ner']
@@ -0,0 +1,110 @@
+import threading
+from email.utils import formatdate
+import pytest
+import requests
+from requests.adapters import BaseAdapter
+import http_client
+from http_client import CircuitBreaker, HttpTransport
+
+class ScriptedAdapter(BaseAdapter):
+    # Answers each request with the next status code from `script`, or raises it when it is
+    # an exception; headers of a status code are given as a (status, headers) pair
+    def __init__(self, script):
+        super().__init__()
+        self.script = list(script)
+        self.requests = []
+
+    def send(self, request, **kwargs):
+        self.requests.append(kwargs.get('timeout'))
+        step = self.script.pop(0)
+        if isinstance(step, Exception):
+            raise step
+        status, headers = step if isinstance(step, tuple) else (step, {})
+        response = requests.Response()
+        response.status_code = status
+        response.headers.update(headers)
+        response.url = request.url
+        response.request = request
+        response._content = b''
+        return response
+
+    def close(self):
+        pass
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    # Backoff takes the top of its jitter range and sleeping is only recorded
+    slept = []
+    monkeypatch.setattr(http_client.random, 'uniform', lambda low, high: high)
+    monkeypatch.setattr(http_client.time, 'sleep', slept.append)
+    return slept
+
+def scripted_transport(script, **kwargs):
+    transport = HttpTransport(backoff_base=0.5, **kwargs)
+    adapter = ScriptedAdapter(script)
+    transport.session.mount('http://', adapter)
+    return transport, adapter
+
+URL = 'http://api.test/v1/things?apiKey=secret'
+
+def test_half_open_breaker_lets_one_trial_through():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60.0)
+    breaker.record_failure()
+    breaker.opened_at -= 60.0  # The reset timeout has passed
+    barrier = threading.Barrier(16)
+    allowed = []
+
+    def call():
+        barrier.wait()
+        allowed.append(breaker.allow())
+
+    threads = [threading.Thread(target=call) for _ in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert allowed.count(True) == 1
+
+    breaker.record_success()
+    assert breaker.allow()
+
+def test_server_errors_and_rate_limits_are_retried_with_backoff(sleeps):
+    transport, adapter = scripted_transport([503, 429, 500, 200], max_retries=3)
+    assert transport.get(URL).status_code == 200
+    assert len(adapter.requests) == 4
+    assert sleeps == [0.5, 1.0, 2.0]
+    stats = transport.latency_stats()['http://api.test/v1/things']
+    assert (stats['requests'], stats['failures'], stats['retries']) == (4, 3, 3)
+    assert transport._breaker('http://api.test/v1/things').failures == 0
+
+def test_backoff_is_capped(sleeps):
+    transport, _ = scripted_transport([502] * 5 + [200], max_retries=5, backoff_max=3.0)
+    assert transport.get(URL).status_code == 200
+    assert sleeps == [0.5, 1.0, 2.0, 3.0, 3.0]
+
+def test_retry_after_is_honored(sleeps):
+    later = formatdate(http_client.time.time() + 120, usegmt=True)
+    script = [(429, {'Retry-After': '7'}), (503, {'Retry-After': later}), (503, {'Retry-After': 'soon'}), 200]
+    transport, _ = scripted_transport(script, max_retries=3, backoff_max=60.0)
+    assert transport.get(URL).status_code == 200
+    assert sleeps[0] == 7.0
+    assert sleeps[1] == 60.0  # Two minutes away, cut to backoff_max
+    assert sleeps[2] == 2.0  # Unparseable, the backoff applies
+
+def test_gives_up_after_the_retry_limit(sleeps):
+    transport, adapter = scripted_transport([503] * 3, max_retries=2, failure_threshold=1)
+    assert transport.get(URL).status_code == 503
+    assert len(adapter.requests) == 3 and sleeps == [0.5, 1.0]
+    with pytest.raises(http_client.CircuitOpenError):
+        transport.get(URL)
+
+    transport, adapter = scripted_transport([requests.ConnectionError('refused')] * 3, max_retries=2)
+    with pytest.raises(requests.ConnectionError):
+        transport.get(URL)
+    assert len(adapter.requests) == 3
+    assert transport.latency_stats()['http://api.test/v1/things']['retries'] == 2
+
+def test_client_errors_are_not_retried(sleeps):
+    transport, adapter = scripted_transport([404, 200], max_retries=3)
+    assert transport.get(URL).status_code == 404
+    assert len(adapter.requests) == 1 and sleeps == []
@@ -0,0 +1,62 @@
+import hashlib
+import numpy as np
+import data_loader
+
+class FakeEncoder:
+    # Deterministic unit vectors from a hash of the text
+    def encode(self, texts, show_progress_bar=False, cache=True):
+        rows = []
+        for text in texts:
+            seed = int.from_bytes(hashlib.sha256(text.encode()).digest()[:8], 'little')
+            vector = np.random.default_rng(seed).normal(size=16).astype('float32')
+            rows.append(vector / np.linalg.norm(vector))
+        return np.vstack(rows)
+
+def make_indexer(tmp_path):
+    return data_loader.IncrementalIndexer(str(tmp_path / 'index.idx'), str(tmp_path / 'docs'),
+                                          str(tmp_path / 'embeddings.pkl'), encoder=FakeEncoder())
+
+def documents(names):
+    return [{'path': f"data/{name}.txt", 'content': f"{name} " * 300, 'meta': {}} for name in names]
+
+def test_batches_are_written_as_they_are_embedded(tmp_path):
+    indexer = make_indexer(tmp_path)
+    stream = indexer.add_stream(iter(documents(['a', 'b', 'c'])), batch_size=1)
+    next(stream)
+    stored = len(indexer.doc_store)
+    assert stored > 0 and indexer.batch == []
+    assert indexer.store.rows == stored
+    list(stream)
+    indexer.commit()
+
+    indexer = make_indexer(tmp_path)
+    assert not indexer.needs_rebuild
+    assert indexer.index.ntotal == len(indexer.doc_store.live_ids()) == indexer.store.size()
+    paths = [doc['path'] for doc in data_loader.documents_from_passages(indexer.documents())]
+    assert paths == ['data/a.txt', 'data/b.txt', 'data/c.txt']
+
+def test_uncommitted_passages_are_dropped_on_the_next_run(tmp_path):
+    indexer = make_indexer(tmp_path)
+    indexer.add(documents(['a']))
+    indexer.commit()
+    committed = len(indexer.doc_store)
+
+    indexer = make_indexer(tmp_path)
+    indexer.add(documents(['b']))  # The run dies before commit()
+
+    indexer = make_indexer(tmp_path)
+    assert not indexer.needs_rebuild
+    assert len(indexer.doc_store.live_ids()) == committed
+    indexer.add(documents(['c']))
+    indexer.commit()
+    paths = {doc['path'] for doc in data_loader.documents_from_passages(indexer.documents())}
+    assert paths == {'data/a.txt', 'data/c.txt'}
+
+def test_embedding_store_writes_rows_at_their_ids(tmp_path):
+    store = data_loader.EmbeddingStore(str(tmp_path / 'embeddings.pkl'))
+    vectors = np.arange(24, dtype='float32').reshape(6, 4)
+    store.write([0, 1, 2], vectors[:3])
+    store.write([5, 3], vectors[[5, 3]])
+    store.write([4], vectors[4:5])
+    assert store.rows == 6
+    np.testing.assert_array_equal(store.vectors, vectors)
@@ -0,0 +1,32 @@
+import numpy as np
+import data_loader
+import index_factory
+
+def clustered(n, d=32, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(20, d))
+    vectors = (centers[rng.integers(0, 20, n)] + 0.5 * rng.normal(size=(n, d))).astype('float32')
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def test_tuning_leaves_each_query_out():
+    vectors = clustered(3000)
+    ids = np.arange(len(vectors), dtype='int64')
+    index = index_factory.build_index(vectors, ids, 'IVF40,Flat')
+    params = index_factory.tune_search(index, vectors, ids, n_queries=50)
+    assert params['recall'] >= index_factory.RECALL_TARGET
+    # Each query finding itself would add 0.1 to recall@10 at nprobe=1
+    index_factory.apply_search_params(index, {'nprobe': 1})
+    one_probe = index_factory.tune_search(index, vectors, ids, n_queries=50, target=0.0)
+    _, found = index.search(vectors[:50], 10)
+    assert (found[:, 0] == ids[:50]).all()
+    assert one_probe['nprobe'] == 1 and one_probe['recall'] < 1.0
+
+def test_pq_that_misses_the_target_falls_back_to_sq8(capsys):
+    vectors = clustered(12000)
+    ids = np.arange(len(vectors), dtype='int64')
+    _, params = data_loader._build_index(vectors, ids, 'ivf', 'pq')
+    # Four one-byte codes for 32 dimensions are far too coarse for the target
+    assert params['requested_spec'].endswith(',PQ4')
+    assert params['spec'].endswith(',SQ8')
+    assert params['recall'] >= index_factory.RECALL_TARGET
+    assert 'Warning' in capsys.readouterr().out
@@ -0,0 +1,32 @@
+from datetime import datetime, timezone
+import data_loader
+from metadata_index import MetadataIndex, parse_query_filters
+
+def write_report(directory, name, lines):
+    path = directory / name
+    path.write_text('\n'.join(lines))
+    return str(path)
+
+def test_strategy_reports_take_the_time_from_their_name(tmp_path):
+    path = write_report(tmp_path, '20250225_180038_NZDUSDc_bearish.txt', [
+        'Symbol: NZDUSDc', 'Strategy: DailyBiasCandlePatterns', 'Trend: bearish'
+    ])
+    meta = data_loader.read_metadata(path)
+    assert meta['type'] == 'strategy'
+    assert meta['pairs'] == ['NZDUSD']
+    assert meta['published_at'] == datetime(2025, 2, 25, 18, 0, 38, tzinfo=timezone.utc).timestamp()
+
+def test_strategy_reports_prefer_their_timestamp_line(tmp_path):
+    path = write_report(tmp_path, '20250225_180038_213070_USDJPYc_bounce.txt', [
+        'Symbol: USDJPYc', 'Strategy: Bounce', 'Timestamp: 20250226_090000'
+    ])
+    assert data_loader.read_metadata(path)['published_at'] == datetime(2025, 2, 26, 9, tzinfo=timezone.utc).timestamp()
+
+def test_strategy_filter_selects_reports_of_the_pair(tmp_path):
+    index = MetadataIndex()
+    index.add(0, {'type': 'strategy', 'pairs': ['EURUSD'], 'published_at': 100.0})
+    index.add(1, {'type': 'news', 'pairs': ['EURUSD'], 'published_at': 200.0})
+    index.add(2, {'type': 'strategy', 'pairs': ['USDJPY'], 'published_at': 300.0})
+    filters = parse_query_filters('EURUSD strategy signals')
+    assert filters == {'pairs': ['EURUSD'], 'doc_type': 'strategy'}
+    assert index.select(**filters).tolist() == [0]
@@ -0,0 +1,114 @@
+import json
+import threading
+from datetime import datetime, timedelta, timezone
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+import pytest
+import news_fetcher
+from http_client import HttpTransport
+from news_store import NewsStore
+
+def make_articles(count, start=None, duplicate_urls=0):
+    # One article a minute going back from start; the last duplicate_urls reuse earlier URLs
+    start = start or datetime.now(timezone.utc).replace(microsecond=0) - timedelta(minutes=5)
+    articles = []
+    for i in range(count):
+        url = f"https://news.example.com/{i % (count - duplicate_urls)}"
+        articles.append({
+            'title': f"EUR/USD update {i}",
+            'content': f"Story {i}",
+            'source': {'name': 'Example'},
+            'url': url,
+            'publishedAt': (start - timedelta(minutes=i)).isoformat().replace('+00:00', 'Z'),
+        })
+    return articles
+
+class FakeNewsApi(BaseHTTPRequestHandler):
+    # /v2/everything over `articles`: from/to filtering, newest first, pageSize pages and a
+    # maximumResultsReached error past `max_results`, like the developer plan
+    articles = []
+    max_results = 100
+    failing_pages = set()
+    requests = []
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        query = {key: values[0] for key, values in parse_qs(urlsplit(self.path).query).items()}
+        FakeNewsApi.requests.append(query)
+        page, size = int(query['page']), int(query['pageSize'])
+        since, until = (datetime.fromisoformat(query[key]) for key in ('from', 'to'))
+        matching = sorted((a for a in self.articles
+                           if since <= news_fetcher._parse_published(a['publishedAt']) <= until),
+                          key=lambda a: a['publishedAt'], reverse=True)
+        if page in self.failing_pages:
+            self._send(500, {'status': 'error', 'code': 'unexpectedError', 'message': 'boom'})
+        elif page * size > self.max_results:
+            self._send(426, {'status': 'error', 'code': 'maximumResultsReached', 'message': 'plan limit'})
+        else:
+            self._send(200, {'status': 'ok', 'totalResults': len(matching),
+                             'articles': matching[(page - 1) * size:page * size]})
+
+    def _send(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+@pytest.fixture
+def news_api(monkeypatch):
+    monkeypatch.setattr(news_fetcher, 'REQUESTS_PER_SECOND', 0)
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeNewsApi)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    FakeNewsApi.articles, FakeNewsApi.max_results, FakeNewsApi.failing_pages = [], 100, set()
+    FakeNewsApi.requests = []
+    transport = HttpTransport(max_retries=0)
+
+    def fetch(store, max_results=None):
+        news_fetcher.fetch_forex_news(store, api_key='test-key', base_url=f"http://127.0.0.1:{server.server_port}/v2/everything",
+                                      transport=transport, max_results=max_results)
+    yield fetch
+    transport.close()
+    server.shutdown()
+    server.server_close()
+
+def stored(store):
+    return [article for _, _, article in store.read_new()]
+
+def test_paging_stops_at_total_results(tmp_path, news_api):
+    FakeNewsApi.articles = make_articles(250)
+    FakeNewsApi.max_results = 1000
+    store = NewsStore(str(tmp_path))
+    news_api(store, max_results=1000)
+    assert sorted(int(request['page']) for request in FakeNewsApi.requests) == [1, 2, 3]
+    assert len(stored(store)) == 250
+    assert news_fetcher.load_watermark(store) == news_fetcher._parse_published(FakeNewsApi.articles[0]['publishedAt'])
+
+def test_results_cap_pages_back_in_time(tmp_path, news_api):
+    FakeNewsApi.articles = make_articles(250)
+    store = NewsStore(str(tmp_path))
+    news_api(store, max_results=100)
+    assert len({request['to'] for request in FakeNewsApi.requests}) == 3
+    assert len(stored(store)) == 250
+    assert news_fetcher.load_watermark(store) is not None
+
+def test_duplicate_urls_are_dropped(tmp_path, news_api):
+    FakeNewsApi.articles = make_articles(60, duplicate_urls=10)
+    store = NewsStore(str(tmp_path))
+    news_api(store)
+    assert len(stored(store)) == 50
+    store.commit()
+    news_api(store)
+    assert stored(store) == []
+
+def test_failed_page_keeps_the_watermark(tmp_path, news_api):
+    FakeNewsApi.articles = make_articles(250)
+    FakeNewsApi.max_results = 1000
+    FakeNewsApi.failing_pages = {2}
+    store = NewsStore(str(tmp_path))
+    news_api(store, max_results=1000)
+    assert len(stored(store)) == 150
+    assert news_fetcher.load_watermark(store) is None
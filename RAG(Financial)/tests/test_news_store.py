@@ -0,0 +1,30 @@
+import json
+from news_store import NewsStore
+
+def write_legacy(directory, name, article):
+    path = directory / name
+    path.write_text(article if isinstance(article, str) else json.dumps(article))
+    return path
+
+def test_migrate_archives_legacy_files_after_they_read_back(tmp_path):
+    legacy = tmp_path / 'forex_news'
+    legacy.mkdir()
+    write_legacy(legacy, 'forex_news_20250409_090904.json',
+                 {'url': 'https://example.com/a', 'title': 'EUR up', 'publishedAt': '2025-04-09T09:00:00Z'})
+    write_legacy(legacy, 'forex_news_20250409_092503.json', '')
+    store = NewsStore(str(tmp_path / 'news_store'))
+
+    assert store.migrate(str(legacy)) == 1
+    assert list(legacy.iterdir()) == []
+    archived = sorted(path.name for path in (tmp_path / 'news_store' / 'legacy').iterdir())
+    assert archived == ['forex_news_20250409_090904.json', 'forex_news_20250409_092503.json']
+    assert [article['title'] for _, _, article in store.read_new()] == ['EUR up']
+
+def test_migrate_keeps_legacy_files_that_did_not_read_back(tmp_path, monkeypatch):
+    legacy = tmp_path / 'forex_news'
+    legacy.mkdir()
+    path = write_legacy(legacy, 'forex_news_20250409_090904.json', {'url': 'https://example.com/a'})
+    store = NewsStore(str(tmp_path / 'news_store'))
+    monkeypatch.setattr(store, '_stored_keys', lambda: set())
+    store.migrate(str(legacy))
+    assert path.exists()
@@ -0,0 +1,113 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+
+# The strategy scripts import each other from their own directory
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'strategies'))
+import scanner
+from market_data import RATE_DTYPE, LocalProvider, MarketDataProvider
+from strategy_reference import reference_setups
+
+# Recorded M15/H1/D1 bars of the scanned symbols; NZDJPYc has none
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'market_data')
+
+class MemoryProvider(MarketDataProvider):
+    def __init__(self, series):
+        self.series = series
+
+    def rates(self, symbol, timeframe, bars):
+        rates = self.series.get((symbol, timeframe))
+        return None if rates is None else rates[-bars:]
+
+def make_rates(closes, opens=None, highs=None, lows=None):
+    closes = np.asarray(closes, dtype='float64')
+    opens = np.r_[closes[:1], closes[:-1]] if opens is None else np.asarray(opens, dtype='float64')
+    rates = np.zeros(len(closes), dtype=RATE_DTYPE)
+    rates['time'] = 1_700_000_000 + 900 * np.arange(len(closes))
+    rates['open'], rates['close'] = opens, closes
+    rates['high'] = np.maximum(opens, closes) + 2e-4 if highs is None else highs
+    rates['low'] = np.minimum(opens, closes) - 2e-4 if lows is None else lows
+    return rates
+
+def random_rates(rng, n):
+    return make_rates(1.1 + np.cumsum(rng.normal(rng.choice([-1, 1]) * 1e-4, 4e-4, n)))
+
+def as_tuples(setups):
+    return [(s['strategy'], s['symbol'], s['trend'], s['stoploss'], s['entry'], s['take_profit'], s['emas'])
+            for s in setups]
+
+def assert_same_setups(found, expected):
+    assert [setup[:3] for setup in found] == [setup[:3] for setup in expected]
+    for got, want in zip(found, expected):
+        assert got[3:6] == pytest.approx(want[3:6], abs=1e-9)
+        assert [e for e in got[6] if e is not None] == pytest.approx([e for e in want[6] if e is not None], rel=1e-9)
+
+def test_replay_matches_the_per_symbol_scripts(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    setups = scanner.run(provider=LocalProvider(FIXTURES))
+
+    expected = reference_setups(LocalProvider(FIXTURES), scanner.UNIVERSE)
+    assert {setup[0] for setup in expected} == set(scanner.UNIVERSE)  # Every strategy fires somewhere
+    assert_same_setups(as_tuples(setups), expected)
+    reports = os.listdir(tmp_path / 'data' / 'strategies')
+    assert len(reports) == len(setups)
+
+def test_each_window_is_read_once_per_scan(tmp_path):
+    provider = LocalProvider(FIXTURES)
+    first = as_tuples(scanner.scan(provider))
+    windows = {(symbol, window) for strategy, symbols in scanner.UNIVERSE.items()
+               for symbol in symbols if symbol != 'NZDJPYc' for window in scanner.WINDOWS[strategy]}
+    assert provider.stats == {'hits': 0, 'misses': len(windows)}
+
+    assert as_tuples(scanner.scan(provider)) == first
+    assert provider.stats == {'hits': len(windows), 'misses': len(windows)}
+
+@pytest.mark.parametrize('adjust', [False, True])
+def test_ema_matches_pandas_on_ragged_rows(adjust):
+    rng = np.random.default_rng(0)
+    values = np.full((6, 300), np.nan)
+    for row, n in enumerate([300, 299, 120, 4, 2, 1]):
+        values[row, -n:] = 1.1 + np.cumsum(rng.normal(0, 5e-4, n))
+    for span in (18, 50, 200):
+        result = scanner.ema(values, span, adjust)
+        for row in range(len(values)):
+            valid = ~np.isnan(values[row])
+            expected = pd.Series(values[row, valid]).ewm(span=span, adjust=adjust).mean()
+            assert np.isnan(result[row, ~valid]).all()
+            np.testing.assert_allclose(result[row, valid], expected, rtol=1e-12)
+
+def test_signals_match_the_per_symbol_scripts_on_short_histories():
+    # Histories from a single bar to a few hundred, so the crossing and continuation checks
+    # run with fewer than four bars
+    rng = np.random.default_rng(1)
+    lengths = [1, 2, 3, 4, 5, 300, 300, 300, 300, 300, 300]
+    series = {}
+    for symbol, n in zip(scanner.UNIVERSE['bounce'], lengths):
+        for timeframe in ('M15', 'H1', 'D1'):
+            series[(symbol, timeframe)] = random_rates(rng, n)
+    # Three bars trending up from a candle that crosses EMA 50, on both timeframes
+    jump = make_rates([1.0, 1.0, 1.1], opens=[1.0, 0.995, 1.0], highs=[1.0002, 1.01, 1.1002], lows=[0.9998, 0.99, 0.9998])
+    series[('GBPUSDc', 'M15')] = series[('GBPUSDc', 'H1')] = jump
+    provider = MemoryProvider(series)
+
+    found = as_tuples(scanner.scan(provider))
+    expected = reference_setups(provider, scanner.UNIVERSE)
+    assert ('bounce', 'GBPUSDc', 'bullish') in [setup[:3] for setup in expected]
+    assert_same_setups(found, expected)
+
+def test_each_strategy_keeps_its_ema_adjustment():
+    # Bounce used ewm(adjust=False), daily bias and trend continuation the pandas default
+    rng = np.random.default_rng(2)
+    series = {(symbol, timeframe): random_rates(rng, 300)
+              for symbol in scanner.UNIVERSE['bounce'] for timeframe in ('M15', 'H1', 'D1')}
+    h1 = scanner.load_bars(MemoryProvider(series), scanner.UNIVERSE['bounce'], 'H1', 500)
+    d1 = scanner.load_bars(MemoryProvider(series), scanner.UNIVERSE['daily_bias'], 'D1', 250)
+    m15 = scanner.load_bars(MemoryProvider(series), scanner.UNIVERSE['bounce'], 'M15', 500)
+    scanner.bounce_signals(m15, h1, scanner.UNIVERSE['bounce'])
+    scanner.daily_bias_signals(d1, scanner.UNIVERSE['daily_bias'])
+    assert set(m15._emas) == {(18, False), (50, False), (200, False)}
+    assert set(d1._emas) == {(50, True), (200, True)}
+    scanner.trend_continuation_signals(h1, scanner.UNIVERSE['trend_continuation'])
+    assert set(h1._emas) == {(span, adjust) for span in (18, 50, 200) for adjust in (False, True)}